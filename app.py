@@ -1,10 +1,16 @@
 import os
-from flask import Flask, render_template, g
+from flask import Flask, render_template, request, g
 from configparser import ConfigParser
-from database.handler import get_db_connection_for_request
+from database.handler import get_db_connection_for_request, DatabaseUnavailable, database_down
+from commands import register_commands
+from services.jobs import init_jobs
+from services.profiling import init_profiling
+from services.templates import init_template_cache
 from routes.data_entry import data_entry_bp
 from routes.evaluation import evaluation_bp
 from routes.querying import querying_bp
+from routes.api import api_bp
+from routes.admin import admin_bp
 
 #create and configure flask
 def create_app():
@@ -20,6 +26,10 @@ def create_app():
 
         config.read(config_path)
         app.config['DB_CONFIG'] = dict(config.items('database'))
+        #other sections ([jobs], ...) are optional and exposed as app.config['JOBS'], ...
+        for section in config.sections():
+            if section != 'database':
+                app.config[section.upper()] = dict(config.items(section))
         
     except FileNotFoundError as e:
         print(f"Error: {e}")
@@ -28,13 +38,41 @@ def create_app():
         print(f"Error reading config file: {e}")
         exit(1)
 
+    #compiled templates survive restarts (fill ahead of time with 'flask precompile-templates')
+    init_template_cache(app)
+
     app.register_blueprint(data_entry_bp)
     app.register_blueprint(evaluation_bp)
     app.register_blueprint(querying_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(admin_bp)
+    register_commands(app)
+    init_jobs(app)
+    #off unless [profiling] enabled=true
+    init_profiling(app)
     #main route
     @app.route('/')
     def index():
         return render_template('index.html') 
+    #while the database is marked down, answer 503 right away instead of
+    #tying up a worker on a connect timeout
+    @app.before_request
+    def fail_fast_when_db_down():
+        if request.endpoint in ('static', 'index') or request.blueprint == 'admin':
+            return None
+        retry_after = database_down()
+        if retry_after:
+            return db_unavailable(DatabaseUnavailable(retry_after))
+        return None
+
+    @app.errorhandler(DatabaseUnavailable)
+    def db_unavailable(error):
+        retry_after = max(int(error.retry_after + 0.999), 1)
+        return (
+            render_template('db_unavailable.html', retry_after=retry_after),
+            503,
+            {'Retry-After': str(retry_after)}
+        )
     #close db connection after each request
     @app.teardown_appcontext
     def close_db_connection(exception):
@@ -0,0 +1,136 @@
+"""
+Compare the sync report path (execute_query, one statement at a time) with
+the async path (run_queries on the aiomysql pool) against a local MySQL.
+
+    python benchmarks/bench_async.py --threads 4 --requests 200 [--fanout 3] [--sleep-ms 20]
+
+Each simulated report request runs --fanout independent SELECTs, like
+query_degree_details does. By default they are the degree-details queries
+for random degrees; --sleep-ms replaces them with SELECT SLEEP() so the
+result isolates server latency (how many queries one worker keeps in flight)
+from row decoding. Needs aiomysql installed; reads config.txt's database.
+Reports throughput and latency percentiles for both paths.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database.handler import execute_query, warm_pool
+from database.async_handler import run_queries
+
+DEGREE_QUERIES = [
+    """
+    SELECT R.course_num, C.course_name, R.core
+    FROM requires R
+    JOIN course C ON R.course_num = C.course_num
+    WHERE R.degree_name = %s AND R.degree_level = %s
+    ORDER BY R.core DESC, R.course_num
+    """,
+    """
+    SELECT L.obj_code, L.title, L.description
+    FROM learning_objective L
+    JOIN associated A ON L.obj_code = A.obj_code
+    WHERE A.degree_name = %s AND A.degree_level = %s
+    GROUP BY L.obj_code, L.title, L.description
+    ORDER BY L.obj_code
+    """,
+    """
+    SELECT A.obj_code, A.course_num
+    FROM associated A
+    WHERE A.degree_name = %s AND A.degree_level = %s
+    """
+]
+
+
+def build_requests(count, fanout, sleep_ms):
+    if sleep_ms:
+        query = ("SELECT SLEEP(%s) AS slept", (sleep_ms / 1000,))
+        return [[query] * fanout for _ in range(count)]
+    degrees = [
+        (r['degree_name'], r['degree_level'])
+        for r in execute_query("SELECT degree_name, degree_level FROM degree")
+    ]
+    if not degrees:
+        sys.exit("No degrees in the database; use --sleep-ms or load some data first.")
+    requests = []
+    for _ in range(count):
+        degree = random.choice(degrees)
+        requests.append([(DEGREE_QUERIES[i % len(DEGREE_QUERIES)], degree) for i in range(fanout)])
+    return requests
+
+
+def run(app, label, requests, threads, handle):
+    latencies = []
+    lock = threading.Lock()
+    queue = list(requests)
+
+    def worker():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                queries = queue.pop()
+            #one app context per simulated request, like a real request
+            with app.app_context():
+                start = time.perf_counter()
+                handle(queries)
+                elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(f"{label:<6} {len(latencies) / wall:8.1f} req/s  "
+          f"p50 {statistics.median(latencies) * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms")
+    return len(latencies) / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4, help='worker threads (like gunicorn --threads)')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--fanout', type=int, default=3, help='independent queries per request')
+    parser.add_argument('--sleep-ms', type=float, default=0, help='use SELECT SLEEP() queries of this length')
+    parser.add_argument('--pool-size', type=int, default=20, help='async pool size')
+    args = parser.parse_args()
+
+    app = create_app()
+    #no shared cache here: we want every query to reach MySQL
+    app.config['CACHE'] = {'backend': 'none'}
+    #pooled sync connections too, so both paths skip connecting per request
+    app.config['DB_CONFIG']['pool_size'] = str(min(args.threads + 1, 32))
+    with app.app_context():
+        requests = build_requests(args.requests, args.fanout, args.sleep_ms)
+        warm_pool()
+
+    print(f"{args.requests} requests x {args.fanout} queries, {args.threads} thread(s)")
+    app.config['ASYNC'] = {'enabled': 'false'}
+    sync_rate = run(app, 'sync', requests, args.threads,
+                    lambda queries: [execute_query(sql, params) for sql, params in queries])
+
+    app.config['ASYNC'] = {'enabled': 'true', 'pool_size': str(args.pool_size)}
+    with app.app_context():
+        #open the pool before timing
+        run_queries([("SELECT 1", None)])
+    async_rate = run(app, 'async', requests, args.threads, run_queries)
+
+    print(f"async path: {async_rate / sync_rate:.2f}x the sync throughput")
+
+
+if __name__ == '__main__':
+    main()
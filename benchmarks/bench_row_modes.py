@@ -0,0 +1,86 @@
+"""
+Compare execute_query's dict rows with row_mode='tuple'.
+
+    python benchmarks/bench_row_modes.py              # against config.txt's database
+    python benchmarks/bench_row_modes.py --synthetic 50000
+
+Reports wall time and peak Python memory (tracemalloc) for each mode.
+The synthetic mode builds rows from fake tuples, so it runs without MySQL.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.handler import execute_query, _row_class
+
+#same shape as the degree sections report, without the degree filter
+REPORT_SQL = """
+    SELECT S.course_num, C.course_name, S.sec_num,
+           S.sec_term, S.sec_year, S.num_students
+    FROM section S
+    JOIN course C ON S.course_num = C.course_num
+    ORDER BY S.sec_year, S.course_num, S.sec_num
+"""
+
+COLUMNS = ('course_num', 'course_name', 'sec_num', 'sec_term', 'sec_year', 'num_students')
+
+
+def measure(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        rows = func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if best is None or elapsed < best[0]:
+            best = (elapsed, peak, len(rows))
+        del rows
+    elapsed, peak, count = best
+    print(f"{label:<8} {count:>8} rows  {elapsed * 1000:9.1f} ms  peak {peak / 1024 / 1024:8.2f} MiB")
+    return best
+
+
+def run_synthetic(count, repeat):
+    raw = [
+        (f"CS{i % 900:04d}", f"Course {i % 900}", f"{i % 10:03d}", 'Fall', 2000 + i % 25, 30)
+        for i in range(count)
+    ]
+    dict_mode = measure('dict', lambda: [dict(zip(COLUMNS, r)) for r in raw], repeat)
+    row_class = _row_class(COLUMNS)
+    tuple_mode = measure('tuple', lambda: [row_class._make(r) for r in raw], repeat)
+    return dict_mode, tuple_mode
+
+
+def run_database(repeat):
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        dict_mode = measure('dict', lambda: execute_query(REPORT_SQL), repeat)
+        tuple_mode = measure('tuple', lambda: execute_query(REPORT_SQL, row_mode='tuple'), repeat)
+    return dict_mode, tuple_mode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--synthetic', type=int, metavar='ROWS',
+                        help='build ROWS fake rows instead of querying MySQL')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        dict_mode, tuple_mode = run_synthetic(args.synthetic, args.repeat)
+    else:
+        dict_mode, tuple_mode = run_database(args.repeat)
+
+    print(f"tuple rows: {tuple_mode[0] / dict_mode[0]:.2f}x the time, "
+          f"{tuple_mode[1] / max(dict_mode[1], 1):.2f}x the peak memory of dict rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Cold start: time from launching a fresh Python process to its first served
+request, with and without the template bytecode cache.
+
+    python benchmarks/bench_startup.py                 # first request: /
+    python benchmarks/bench_startup.py --path /query/ --repeat 10
+
+Each run is a new interpreter, so imports, create_app() and template
+compilation are all paid again. Like a serve.py worker, the child compiles
+every template before taking its first request (the warm phase). The
+request goes through the test client; pages that need the database answer
+503 without one, which still renders a template. Reports the median of
+each phase.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#runs in the child; prints its phase timings as JSON
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from app import create_app
+from services.templates import compile_templates
+imported = time.perf_counter()
+app = create_app()
+if {mode!r} == 'compile':
+    app.jinja_env.bytecode_cache = None
+created = time.perf_counter()
+compile_templates(app)
+warmed = time.perf_counter()
+response = app.test_client().get({path!r})
+served = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start,
+    'create_app': created - imported,
+    'warm': warmed - created,
+    'first_request': served - warmed,
+    'status': response.status_code
+}}))
+"""
+
+
+def run_once(mode, path):
+    code = CHILD.format(root=ROOT, mode=mode, path=path)
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    total = time.perf_counter() - start
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['total'] = total
+    return timings
+
+
+def precompile():
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    from services.templates import compile_templates
+    app = create_app()
+    if app.jinja_env.bytecode_cache is None:
+        raise SystemExit("the template bytecode cache is off in config.txt ([templates] bytecode_cache)")
+    compile_templates(app)
+
+
+def report(label, runs):
+    status = runs[0]['status']
+    phases = ('import', 'create_app', 'warm', 'first_request', 'total')
+    medians = {phase: statistics.median(run[phase] for run in runs) * 1000 for phase in phases}
+    print(f"{label:<8} " + '  '.join(f"{phase} {medians[phase]:6.1f} ms" for phase in phases) + f"  (HTTP {status})")
+    return medians
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold start to first served request.')
+    parser.add_argument('--path', default='/', help='URL of the first request.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    compiled = report('compile', [run_once('compile', args.path) for _ in range(args.repeat)])
+    precompile()
+    cached = report('cached', [run_once('cached', args.path) for _ in range(args.repeat)])
+    saved = compiled['total'] - cached['total']
+    print(f"bytecode cache saves {saved:.1f} ms ({saved / compiled['total'] * 100:.0f}%) per cold start")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Concurrent write-contention load test for POST /evaluation/save.
+
+    python benchmarks/loadtest_eval_save.py --threads 32 --requests 500 \
+        [--term Fall --year 2024] [--hot-courses 3] [--duplicate-ratio 0.5]
+
+Runs against the database in config.txt (use a scratch copy: it writes
+objective_eval rows). It picks sections from the chosen term that have
+linked objectives, then has many threads replay realistic save forms
+at once. --hot-courses focuses the load on a few courses so that forms
+collide, and --duplicate-ratio ticks the "use for other degrees" box on
+that fraction of objectives.
+
+Reports throughput, latency percentiles, failed saves, version conflicts,
+deadlock/lock-wait retries done by run_in_transaction, and InnoDB row-lock waits and
+deadlocks observed on the server during the run.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database import handler
+from database.handler import execute_query
+
+
+def server_lock_counters():
+    #a plain cursor: SHOW isn't a SELECT to execute_query, and server counters must never come from the query cache
+    cursor = handler.get_db_connection_for_request().cursor()
+    try:
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock%'")
+        status = {name: int(value) for name, value in cursor.fetchall()}
+        try:
+            cursor.execute("SELECT `COUNT` FROM information_schema.INNODB_METRICS WHERE NAME = 'lock_deadlocks'")
+            row = cursor.fetchone()
+            status['deadlocks'] = int(row[0]) if row else 0
+        except Exception:
+            status['deadlocks'] = 0
+    finally:
+        cursor.close()
+    return status
+
+
+def load_targets(sec_term, sec_year, hot_courses):
+    """Every (section, degree) pair in the term with its linked objectives."""
+    rows = execute_query("""
+        SELECT S.course_num, S.sec_num, S.num_students,
+               A.degree_name, A.degree_level, A.obj_code, OE.version
+        FROM section S
+        JOIN associated A ON A.course_num = S.course_num
+        LEFT JOIN objective_eval OE
+          ON OE.course_num = S.course_num AND OE.sec_num = S.sec_num
+         AND OE.sec_term = S.sec_term AND OE.sec_year = S.sec_year
+         AND OE.degree_name = A.degree_name AND OE.degree_level = A.degree_level
+         AND OE.obj_code = A.obj_code
+        WHERE S.sec_term = %s AND S.sec_year = %s
+        ORDER BY S.course_num, S.sec_num, A.degree_name, A.degree_level, A.obj_code
+    """, (sec_term, sec_year))
+
+    targets = {}
+    for r in rows:
+        key = (r['course_num'], r['sec_num'], r['degree_name'], r['degree_level'])
+        target = targets.setdefault(key, {'num_students': r['num_students'], 'objectives': []})
+        target['objectives'].append((r['obj_code'], r['version']))
+
+    targets = [(key, t) for key, t in targets.items()]
+    if hot_courses:
+        courses = sorted({key[0] for key, _ in targets})[:hot_courses]
+        targets = [(key, t) for key, t in targets if key[0] in courses]
+    return targets
+
+
+def build_form(target, sec_term, sec_year, duplicate_ratio):
+    (course_num, sec_num, degree_name, degree_level), info = target
+    form = {
+        'degree_name': degree_name,
+        'degree_level': degree_level,
+        'sec_term': sec_term,
+        'sec_year': str(sec_year)
+    }
+    size = info['num_students'] or 0
+    #versions are from before the run, so colliding saves show up as conflicts
+    for obj_code, version in info['objectives']:
+        prefix = f"{course_num}|{sec_num}|{degree_name}|{degree_level}|{obj_code}|"
+        #random split of the class into A/B/C/F that adds up to num_students
+        cuts = sorted(random.randint(0, size) for _ in range(3))
+        a, b, c, f = cuts[0], cuts[1] - cuts[0], cuts[2] - cuts[1], size - cuts[2]
+        form[prefix + 'based_on'] = random.choice(['Final exam', 'Project', 'Lab report'])
+        form[prefix + 'perform_a'] = str(a)
+        form[prefix + 'perform_b'] = str(b)
+        form[prefix + 'perform_c'] = str(c)
+        form[prefix + 'perform_f'] = str(f)
+        form[prefix + 'improvements'] = random.choice(['', 'More practice problems.'])
+        form[prefix + 'version'] = '' if version is None else str(version)
+        if random.random() < duplicate_ratio:
+            form[prefix + 'duplicate'] = 'on'
+    return form
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent /evaluation/save load test.')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--term', default='Fall')
+    parser.add_argument('--year', type=int, default=2024)
+    parser.add_argument('--hot-courses', type=int, default=3,
+                        help='only use the first N courses (0 = all) to force collisions')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=5330)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    app = create_app()
+    #one pooled connection per load thread
+    app.config['DB_CONFIG']['pool_size'] = str(min(args.threads + 1, 32))
+
+    with app.app_context():
+        targets = load_targets(args.term, args.year, args.hot_courses)
+        if not targets:
+            raise SystemExit(f"No sections with linked objectives in {args.term} {args.year}.")
+        forms = [
+            build_form(random.choice(targets), args.term, args.year, args.duplicate_ratio)
+            for _ in range(args.requests)
+        ]
+        before = server_lock_counters()
+
+    stats_before = dict(handler.transaction_stats)
+    latencies = []
+    failures = []
+    conflicts = []
+    lock = threading.Lock()
+    queue = list(enumerate(forms))
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                if not queue:
+                    return
+                _, form = queue.pop()
+            start = time.perf_counter()
+            response = client.post('/evaluation/save', data=form)
+            elapsed = time.perf_counter() - start
+            #the view reports success/failure through flash messages
+            with client.session_transaction() as session:
+                flashes = session.pop('_flashes', [])
+            with lock:
+                latencies.append(elapsed)
+                errors = [msg for category, msg in flashes if category == 'error']
+                #optimistic-concurrency conflicts are expected under contention
+                conflicts.extend(msg for msg in errors if msg.startswith('Not saved because'))
+                errors = [msg for msg in errors if not msg.startswith('Not saved because')]
+                if response.status_code >= 400 or errors:
+                    failures.append(errors[0] if errors else f"HTTP {response.status_code}")
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    with app.app_context():
+        after = server_lock_counters()
+    stats = {k: handler.transaction_stats[k] - stats_before[k] for k in stats_before}
+
+    print(f"requests        {len(latencies)} in {wall:.2f}s with {args.threads} threads "
+          f"({len(targets)} section/degree targets)")
+    print(f"throughput      {len(latencies) / wall:.1f} saves/s")
+    print("latency ms      p50 {:.1f}  p90 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+        *(percentile(latencies, p) * 1000 for p in (50, 90, 99, 100))))
+    print(f"conflicts       {len(conflicts)} save(s) had objectives changed by another save")
+    print(f"failed saves    {len(failures)}")
+    for message in sorted(set(failures))[:5]:
+        print(f"                - {message}")
+    print(f"app retries     {stats['retries']} (deadlocks {stats['deadlocks']}, "
+          f"lock wait timeouts {stats['lock_wait_timeouts']})")
+    waits = after.get('Innodb_row_lock_waits', 0) - before.get('Innodb_row_lock_waits', 0)
+    wait_ms = after.get('Innodb_row_lock_time', 0) - before.get('Innodb_row_lock_time', 0)
+    print(f"server locks    {waits} row lock waits, {wait_ms} ms waiting, "
+          f"{after['deadlocks'] - before['deadlocks']} deadlocks")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+import datetime
+import json
+import os
+import time
+import click
+from flask import current_app
+from database.handler import get_db_connection_for_request, execute_query
+from database.archive import archive_year, archived_through
+from database.dashboard import refresh_all
+from services.eval_import import import_evaluations
+from database.curriculum import clone_curriculum
+from services.changes import read_changes, TABLES
+from services.templates import compile_templates
+from services.audit import run_audit, audit_report
+from services.snapshot import export_snapshot, Snapshot, GROUP_KEYS, MEASURE_COLUMNS
+
+#folder with numbered .sql files applied in name order
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def split_sql(script):
+    """Split a migration file into statements (one statement per ';' line ending)."""
+    statements = []
+    current = []
+    for line in script.splitlines():
+        if line.strip().startswith('--'):
+            continue
+        current.append(line)
+        if line.rstrip().endswith(';'):
+            statement = '\n'.join(current).strip().rstrip(';')
+            if statement:
+                statements.append(statement)
+            current = []
+    leftover = '\n'.join(current).strip()
+    if leftover:
+        statements.append(leftover)
+    return statements
+
+
+def register_commands(app):
+    """Attach the `flask --app app <command>` helpers to the app."""
+
+    @app.cli.command('migrate')
+    def migrate():
+        """Apply pending SQL files from migrations/ (run after database_schema.sql)."""
+        conn = get_db_connection_for_request()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    name VARCHAR(100) PRIMARY KEY,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("SELECT name FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+
+            pending = sorted(
+                name for name in os.listdir(MIGRATIONS_DIR)
+                if name.endswith('.sql') and name not in applied
+            )
+            if not pending:
+                click.echo('Database is up to date.')
+                return
+
+            for name in pending:
+                with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+                    statements = split_sql(f.read())
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (name) VALUES (%s)", (name,)
+                )
+                conn.commit()
+                click.echo(f'Applied {name}')
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def snapshot_dir(directory):
+        return directory or current_app.config.get('SNAPSHOT', {}).get('directory', 'snapshots')
+
+    @app.cli.command('snapshot-export')
+    @click.option('--dir', 'directory', help='Snapshot folder (default: [snapshot] directory).')
+    @click.option('--term', 'sec_term', help='Only refresh this term (needs --year).')
+    @click.option('--year', 'sec_year', type=int, help='Only refresh this year.')
+    def snapshot_export(directory, sec_term, sec_year):
+        """Export objective_eval facts to the columnar snapshot (all terms, or one)."""
+        terms = None
+        if sec_term or sec_year:
+            if not (sec_term and sec_year):
+                raise click.UsageError('--term and --year go together.')
+            terms = [(sec_term, sec_year)]
+        written = export_snapshot(snapshot_dir(directory), terms)
+        for (term, year), count in sorted(written.items(), key=lambda item: (item[0][1], item[0][0])):
+            click.echo(f'{term} {year}: {count} row(s)')
+
+    @app.cli.command('snapshot-query')
+    @click.option('--dir', 'directory', help='Snapshot folder (default: [snapshot] directory).')
+    @click.option('--by', default='degree', show_default=True,
+                  help=f"Comma-separated group keys: {', '.join(GROUP_KEYS)}.")
+    @click.option('--year', 'years', type=int, multiple=True, help='Limit to these years.')
+    def snapshot_query(directory, by, years):
+        """Grouped totals from the snapshot; no database connection needed."""
+        keys = tuple(k.strip() for k in by.split(',') if k.strip())
+        with Snapshot(snapshot_dir(directory)) as snap:
+            totals = snap.aggregate(by=keys, years=set(years) or None)
+        columns = MEASURE_COLUMNS + ('rows',)
+        click.echo('\t'.join(keys + columns))
+        for group in sorted(totals):
+            click.echo('\t'.join(str(v) for v in group + tuple(totals[group][c] for c in columns)))
+
+    @app.cli.command('archive-years')
+    @click.option('--through', 'through_year', type=int, required=True,
+                  help='Archive every year up to and including this one.')
+    def archive_years(through_year):
+        """Move closed academic years of section/teaches/objective_eval into the archive tables."""
+        current_year = datetime.date.today().year
+        if through_year >= current_year:
+            raise click.UsageError(f'{through_year} is not closed yet; archive years before {current_year}.')
+
+        row = execute_query("SELECT MIN(sec_year) AS first_year FROM section", fetch_one=True)
+        if not row or row['first_year'] is None:
+            click.echo('No sections to archive.')
+            return
+
+        start = max(int(row['first_year']), (archived_through() or 0) + 1)
+        #one transaction per year keeps each lock window short
+        for year in range(start, through_year + 1):
+            moved = archive_year(year)
+            click.echo(f"{year}: " + ', '.join(f"{n} {table}" for table, n in moved.items()))
+
+    @app.cli.command('rebuild-dashboard')
+    def rebuild_dashboard():
+        """Rebuild the instructor_dashboard read model from scratch (after bulk loads)."""
+        count = refresh_all()
+        click.echo(f'instructor_dashboard: {count} row(s)')
+
+    @app.cli.command('import-evaluations')
+    @click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+    @click.option('--chunk-size', default=500, show_default=True, help='Rows per staging insert and per upsert transaction.')
+    @click.option('--dry-run', is_flag=True, help='Only validate; write nothing.')
+    def import_evaluations_command(csv_file, chunk_size, dry_run):
+        """Import evaluation results from a CSV (same columns as the upload page)."""
+        result = import_evaluations(csv_file, chunk_size=chunk_size, dry_run=dry_run)
+        for line, message in result['errors']:
+            click.echo(f'line {line}: {message}', err=True)
+        click.echo(
+            f"{result['rows']} row(s) read, {result['valid']} valid, "
+            f"{result['imported']} imported, {len(result['errors'])} rejected"
+        )
+
+    @app.cli.command('clone-degree')
+    @click.argument('source')
+    @click.argument('target')
+    @click.option('--course', 'courses', multiple=True, help='Only copy this course (repeatable).')
+    @click.option('--objective', 'objectives', multiple=True, help='Only copy links to this objective (repeatable).')
+    @click.option('--dry-run', is_flag=True, help='Show what would be copied; write nothing.')
+    def clone_degree(source, target, courses, objectives, dry_run):
+        """Copy SOURCE's requires/associated rows to TARGET (both "Name|Level")."""
+        if '|' not in source or '|' not in target:
+            raise click.UsageError('Degrees are written "Name|Level".')
+        try:
+            diff = clone_curriculum(
+                source.split('|', 1), target.split('|', 1),
+                courses=list(courses), objectives=list(objectives), dry_run=dry_run
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        prefix = '+ ' if dry_run else 'added '
+        for r in diff['requires_new']:
+            click.echo(f"{prefix}requires {r['course_num']} core={r['core']}")
+        for a in diff['associated_new']:
+            click.echo(f"{prefix}associated {a['course_num']} {a['obj_code']}")
+        click.echo(
+            f"{len(diff['requires_new'])} requirement(s) and {len(diff['associated_new'])} link(s) "
+            f"{'to add' if dry_run else 'added'}; "
+            f"{len(diff['requires_present']) + len(diff['associated_present'])} already present"
+        )
+
+    @app.cli.command('changes')
+    @click.option('--since', type=int, default=0, show_default=True, help='Cursor from the previous run.')
+    @click.option('--batch', type=int, default=1000, show_default=True, help='Changes per database round trip.')
+    @click.option('--table', 'tables', multiple=True, type=click.Choice(TABLES), help='Only these tables (repeatable).')
+    @click.option('--follow', is_flag=True, help='Keep polling for new changes.')
+    @click.option('--interval', type=float, default=2, show_default=True, help='Seconds between polls with --follow.')
+    def changes(since, batch, tables, follow, interval):
+        """Stream the change feed as JSON lines; the next cursor goes to stderr."""
+        cursor = since
+        try:
+            while True:
+                page = read_changes(since=cursor, limit=batch, tables=list(tables) or None)
+                for change in page['changes']:
+                    click.echo(json.dumps(change))
+                cursor = page['next']
+                if page['more']:
+                    continue
+                if not follow:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        click.echo(f'next cursor: {cursor}', err=True)
+
+    @app.cli.command('audit')
+    @click.option('--full', is_flag=True, help='Re-audit every term, not just the ones changed since the last run.')
+    @click.option('--term', 'sec_term', type=click.Choice(['Spring', 'Summer', 'Fall']), help='Only audit this term (needs --year).')
+    @click.option('--year', 'sec_year', type=int, help='Year for --term.')
+    @click.option('--sample', default=5, show_default=True, help='Keys kept per check and term.')
+    def audit(full, sec_term, sec_year, sample):
+        """Check for orphaned evaluations, untaught sections and bad grade totals."""
+        if bool(sec_term) != bool(sec_year):
+            raise click.UsageError('--term and --year go together.')
+        terms = [(sec_year, sec_term)] if sec_term else None
+        result = run_audit(full=full, terms=terms, sample=sample)
+        click.echo(f"audited {len(result['terms'])} term(s) in {result['seconds']} s")
+        for check in audit_report()['checks']:
+            click.echo(f"{check['name']}: {check['anomalies']}")
+            for t in check['terms']:
+                keys = '; '.join(
+                    ', '.join(f'{key}={value}' for key, value in sample_key.items())
+                    for sample_key in t['samples']
+                )
+                click.echo(f"  {t['sec_term']} {t['sec_year']}: {t['anomalies']}  e.g. {keys}")
+
+    @app.cli.command('precompile-templates')
+    @click.option('--clear', is_flag=True, help='Empty the cache first.')
+    def precompile_templates(clear):
+        """Compile every template into the [templates] bytecode cache (run at deploy time)."""
+        cache = app.jinja_env.bytecode_cache
+        if cache is None:
+            raise click.ClickException('The template bytecode cache is off ([templates] bytecode_cache).')
+        if clear:
+            cache.clear()
+        start = time.perf_counter()
+        names, errors = compile_templates(app)
+        for name, message in errors:
+            click.echo(f'{name}: {message}', err=True)
+        click.echo(
+            f'{len(names) - len(errors)} template(s) compiled into {cache.directory} '
+            f'in {(time.perf_counter() - start) * 1000:.0f} ms'
+        )
+        if errors:
+            raise click.ClickException(f'{len(errors)} template(s) failed to compile.')
@@ -0,0 +1,66 @@
+"""
+Archival of closed academic years.
+
+section, teaches and objective_eval rows for archived years live in
+<table>_archive tables with the same columns. Reports call year_source()
+to get the table to read from: the live table alone when the requested
+years are all newer than the archive, or live + archive otherwise.
+"""
+from flask import g
+from database.handler import execute_query, run_in_transaction, bump_tables
+
+#children first when deleting, parents first when copying
+ARCHIVED_TABLES = ('section', 'teaches', 'objective_eval')
+
+
+def archived_through():
+    """Last archived year, or None if nothing has been archived (read once per request)."""
+    if 'archived_through' not in g:
+        row = execute_query(
+            "SELECT archived_through FROM archive_state WHERE id = 1",
+            fetch_one=True
+        )
+        g.archived_through = int(row['archived_through']) if row and row['archived_through'] else None
+    return g.archived_through
+
+
+def year_source(table, start_year):
+    """Table expression for reading `table` from start_year onward."""
+    through = archived_through()
+    if through is None or int(start_year) > through:
+        return table
+    return f"(SELECT * FROM {table} UNION ALL SELECT * FROM {table}_archive)"
+
+
+def archive_year(sec_year):
+    """Move one academic year into the archive tables in a single transaction."""
+    def move(cursor):
+        moved = {}
+        #change_log triggers record these deletes as source 'archive', not real removals
+        cursor.execute("SET @change_source = 'archive'")
+        for table in ARCHIVED_TABLES:
+            cursor.execute(
+                f"INSERT INTO {table}_archive SELECT * FROM {table} WHERE sec_year = %s",
+                (sec_year,)
+            )
+            moved[table] = cursor.rowcount
+        for table in reversed(ARCHIVED_TABLES):
+            cursor.execute(f"DELETE FROM {table} WHERE sec_year = %s", (sec_year,))
+        cursor.execute(
+            "UPDATE archive_state SET archived_through = %s "
+            "WHERE id = 1 AND (archived_through IS NULL OR archived_through < %s)",
+            (sec_year, sec_year)
+        )
+        return moved
+
+    try:
+        moved = run_in_transaction(move)
+    finally:
+        #don't leave the marker on a pooled connection
+        try:
+            execute_query("SET @change_source = NULL")
+        except Exception:
+            pass
+    g.pop('archived_through', None)
+    bump_tables('archive_state', *ARCHIVED_TABLES, *(f"{t}_archive" for t in ARCHIVED_TABLES))
+    return moved
@@ -0,0 +1,173 @@
+"""
+Async read path on aiomysql, for reports that need several queries.
+
+Flask views stay synchronous (WSGI), so the async side lives on one
+background event loop per process with its own aiomysql pool. A view hands
+it a batch of SELECTs with run_queries(); they go out concurrently on
+separate pooled connections, and the worker thread waits once for the whole
+batch instead of once per query. Async code (another loop, e.g. an async
+view) can await aquery() directly.
+
+Enable with an [async] section in config.txt:
+
+    [async]
+    enabled=true
+    pool_size=10
+
+Without it run_queries() falls back to execute_query() one statement at a
+time, so callers don't need to care. aiomysql is only needed (and only
+imported) when enabled.
+"""
+import asyncio
+import os
+import threading
+from flask import current_app
+from database.handler import (
+    execute_query, _db_settings, _query_cache, _shape_rows,
+    _mark_down, _mark_up, database_down, DatabaseUnavailable
+)
+
+
+def _aiomysql():
+    """The aiomysql module, imported only once [async] is enabled; None if it isn't installed."""
+    try:
+        import aiomysql
+    except ImportError:
+        return None
+    return aiomysql
+
+
+class AsyncDatabase:
+    """One event loop thread and one aiomysql pool for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+        self._pool = None
+        self._pool_lock = None
+
+    def loop(self):
+        #a forked worker gets a fresh loop thread and pool
+        if self._loop is None or self._pid != os.getpid():
+            with self._lock:
+                if self._loop is None or self._pid != os.getpid():
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='async-db', daemon=True).start()
+                    self._loop = loop
+                    self._pid = os.getpid()
+                    self._pool = None
+                    self._pool_lock = None
+        return self._loop
+
+    async def _get_pool(self, config, pool_size):
+        #runs on the loop thread, so everything it needs is passed in (no current_app here)
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self._pool is None:
+                settings = _db_settings(config)
+                try:
+                    self._pool = await _aiomysql().create_pool(
+                        host=settings['host'],
+                        user=settings['user'],
+                        password=settings['password'],
+                        db=settings['database'],
+                        connect_timeout=settings['connection_timeout'],
+                        minsize=1,
+                        maxsize=pool_size,
+                        #read-only use; autocommit keeps pooled connections off stale snapshots
+                        autocommit=True
+                    )
+                except Exception as err:
+                    _mark_down(config)
+                    raise DatabaseUnavailable(database_down()) from err
+                _mark_up()
+        return self._pool
+
+    async def fetch(self, config, pool_size, sql, params=None):
+        """(columns, rows) for one SELECT, on a pooled connection."""
+        pool = await self._get_pool(config, pool_size)
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, params or None)
+                rows = await cursor.fetchall()
+                columns = tuple(d[0] for d in cursor.description)
+        return columns, list(rows)
+
+    async def fetch_many(self, config, pool_size, queries):
+        return await asyncio.gather(*(self.fetch(config, pool_size, sql, params) for sql, params in queries))
+
+
+_async_db = AsyncDatabase()
+
+
+def _pool_size():
+    return int(current_app.config.get('ASYNC', {}).get('pool_size', 10))
+
+
+def async_enabled():
+    """True when [async] enabled=true (which needs aiomysql installed)."""
+    config = current_app.config.get('ASYNC', {})
+    if config.get('enabled', 'false').lower() not in ('1', 'true', 'yes', 'on'):
+        return False
+    if _aiomysql() is None:
+        raise RuntimeError("[async] enabled=true needs the aiomysql package: pip install aiomysql")
+    return True
+
+
+async def aquery(sql, params=None, fetch_one=False, row_mode='dict'):
+    """Await one SELECT from any event loop (runs on the handler's loop and pool)."""
+    config = current_app.config['DB_CONFIG']
+    future = asyncio.run_coroutine_threadsafe(_async_db.fetch(config, _pool_size(), sql, params), _async_db.loop())
+    columns, rows = await asyncio.wrap_future(future)
+    return _shape_rows(columns, rows, row_mode, fetch_one)
+
+
+def run_queries(queries, row_mode='dict'):
+    """
+    Run several independent SELECTs, given as (sql, params) pairs, and
+    return their row lists in the same order. Cached results are used when
+    a [cache] is configured; the rest run concurrently on the async pool.
+    """
+    queries = list(queries)
+    if not async_enabled():
+        return [execute_query(sql, params, row_mode=row_mode) for sql, params in queries]
+
+    config = current_app.config['DB_CONFIG']
+    if database_down():
+        raise DatabaseUnavailable(database_down())
+
+    results = [None] * len(queries)
+    cache = _query_cache()
+    keys = [None] * len(queries)
+    pending = []
+    for i, (sql, params) in enumerate(queries):
+        #pooled connections are autocommit, so each read is a fresh snapshot and safe to cache
+        if cache is not None:
+            try:
+                keys[i] = cache.key(sql, params, 'rows')
+                hit = cache.get(keys[i])
+                if hit is not None:
+                    results[i] = _shape_rows(hit[0], hit[1], row_mode, False)
+                    continue
+            except Exception as e:
+                print(f"Query cache error (read): {e}")
+                keys[i] = None
+        pending.append(i)
+
+    if pending:
+        future = asyncio.run_coroutine_threadsafe(
+            _async_db.fetch_many(config, _pool_size(), [queries[i] for i in pending]),
+            _async_db.loop()
+        )
+        timeout = config.get('read_timeout')
+        fetched = future.result(float(timeout) * 2 if timeout else None)
+        for i, (columns, rows) in zip(pending, fetched):
+            if keys[i] is not None:
+                try:
+                    cache.set(keys[i], (columns, rows))
+                except Exception as e:
+                    print(f"Query cache error (write): {e}")
+            results[i] = _shape_rows(columns, rows, row_mode, False)
+    return results
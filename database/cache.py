@@ -0,0 +1,251 @@
+"""
+Optional query-result cache shared by every worker process.
+
+Enabled with a [cache] section in config.txt:
+
+    [cache]
+    backend=redis            ; or sqlite (a shared file, handy for tests)
+    url=redis://localhost:6379/0
+    path=query_cache.sqlite3
+    ttl_seconds=300
+
+Entries are keyed by the normalized SQL, its params and the current
+generation counter of every table the query reads. Writes bump the
+counters of the tables they touch (database.handler.bump_tables), so
+every worker stops using dependent entries at the same moment; the old
+entries simply age out. Values are stored as JSON (Decimal, date/time and
+bytes columns are tagged), never pickled, since the store may be shared over
+the network.
+
+The generation counters are shared even without a cache: with backend=none
+they live in a small SQLite file ([cache] generations_path, default
+table_generations.sqlite3; relative paths are under the app directory), so
+per-process caches such as the coverage matrix see other workers' and CLI
+commands' writes too.
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+_TABLES_READ = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    return _SPACES.sub(' ', sql).strip()
+
+
+def tables_read(sql):
+    """Tables named after FROM/JOIN (subqueries included), lowercased and sorted."""
+    return sorted({name.lower() for name in _TABLES_READ.findall(sql)})
+
+
+def _encode(value):
+    """JSON stand-ins for the column types json can't hold; rows never contain dicts."""
+    if isinstance(value, Decimal):
+        return {'$decimal': str(value)}
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, timedelta):
+        return {'$timedelta': [value.days, value.seconds, value.microseconds]}
+    if isinstance(value, (bytes, bytearray)):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, set):
+        return {'$set': sorted(value)}
+    raise TypeError(f"Can't cache a {type(value).__name__} value")
+
+
+def _decode(obj):
+    if len(obj) != 1:
+        return obj
+    tag, value = next(iter(obj.items()))
+    if tag == '$decimal':
+        return Decimal(value)
+    if tag == '$datetime':
+        return datetime.fromisoformat(value)
+    if tag == '$date':
+        return date.fromisoformat(value)
+    if tag == '$timedelta':
+        return timedelta(days=value[0], seconds=value[1], microseconds=value[2])
+    if tag == '$bytes':
+        return base64.b64decode(value)
+    if tag == '$set':
+        return set(value)
+    return obj
+
+
+class SQLiteBackend:
+    """File-backed store that several processes on one machine can share."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS generations (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM entries WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl)
+        )
+        #now and then, clear out expired entries
+        if random.random() < 0.01:
+            conn.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+
+    def incr(self, name):
+        self._conn().execute(
+            "INSERT INTO generations (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def counters(self, names):
+        if not names:
+            return []
+        placeholders = ', '.join('?' * len(names))
+        rows = dict(self._conn().execute(
+            f"SELECT name, value FROM generations WHERE name IN ({placeholders})", names
+        ).fetchall())
+        return [rows.get(name, 0) for name in names]
+
+
+class RedisBackend:
+    """Any Redis-compatible server (redis, valkey, keydb...)."""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("[cache] backend=redis needs the redis package: pip install redis")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get('q:' + key)
+
+    def set(self, key, value, ttl):
+        self._client.set('q:' + key, value, ex=int(ttl))
+
+    def incr(self, name):
+        self._client.incr('gen:' + name)
+
+    def counters(self, names):
+        if not names:
+            return []
+        return [int(v or 0) for v in self._client.mget(['gen:' + n for n in names])]
+
+
+class QueryCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+
+    def key(self, sql, params, variant):
+        tables = tables_read(sql)
+        generations = self.backend.counters(tables)
+        raw = repr((normalize_sql(sql), tuple(params or ()), variant, list(zip(tables, generations))))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """(columns, rows) stored under key, or None; an unreadable entry counts as a miss."""
+        value = self.backend.get(key)
+        if value is None:
+            return None
+        try:
+            columns, rows = json.loads(value, object_hook=_decode)
+        except ValueError:
+            return None
+        return tuple(columns), [tuple(row) for row in rows]
+
+    def set(self, key, value):
+        columns, rows = value
+        self.backend.set(key, json.dumps([columns, rows], default=_encode), self.ttl)
+
+    def bump(self, tables):
+        for table in tables:
+            self.backend.incr(table)
+
+    def generations(self, tables):
+        return tuple(self.backend.counters(list(tables)))
+
+
+def _app_path(app_config, path):
+    """A config path relative to the app directory (like [jobs] path), so the CLI and the workers share one file."""
+    return os.path.join(app_config.root_path, path)
+
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache(app_config):
+    """This process's QueryCache, or None when [cache] is not configured."""
+    global _cache, _cache_pid
+    config = app_config.get('CACHE', {})
+    backend = config.get('backend', 'none').lower()
+    if backend in ('', 'none', 'off'):
+        return None
+
+    #built after fork so each worker has its own client/sockets
+    if _cache is None or _cache_pid != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache_pid != os.getpid():
+                if backend == 'redis':
+                    store = RedisBackend(config.get('url', 'redis://localhost:6379/0'))
+                elif backend == 'sqlite':
+                    store = SQLiteBackend(_app_path(app_config, config.get('path', 'query_cache.sqlite3')))
+                else:
+                    raise RuntimeError(f"Unknown [cache] backend: {backend}")
+                _cache = QueryCache(store, int(config.get('ttl_seconds', 300)))
+                _cache_pid = os.getpid()
+    return _cache
+
+
+_generations = None
+_generations_pid = None
+
+
+def get_generation_store(app_config):
+    """
+    Where the per-table write counters live: the query cache's backend when
+    one is configured, otherwise a SQLite file shared by this machine's workers.
+    """
+    global _generations, _generations_pid
+    cache = get_query_cache(app_config)
+    if cache is not None:
+        return cache.backend
+    if _generations is None or _generations_pid != os.getpid():
+        with _cache_lock:
+            if _generations is None or _generations_pid != os.getpid():
+                config = app_config.get('CACHE', {})
+                _generations = SQLiteBackend(
+                    _app_path(app_config, config.get('generations_path', 'table_generations.sqlite3'))
+                )
+                _generations_pid = os.getpid()
+    return _generations
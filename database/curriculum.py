@@ -0,0 +1,138 @@
+"""
+Copy one degree's curriculum (requires + associated rows) to another
+degree, e.g. a new MS built from an existing BS. Everything is
+INSERT ... SELECT in a single transaction; rows the target already has are
+left alone, so cloning twice is harmless.
+"""
+from database.handler import run_in_transaction, bump_tables
+from database.dashboard import refresh_degree
+
+
+def _in_list(column, values, params):
+    """' AND column IN (%s, ...)' for an optional filter, appending to params."""
+    if not values:
+        return ""
+    params.extend(values)
+    return f" AND {column} IN ({', '.join(['%s'] * len(values))})"
+
+
+def _requires_sql(source, target, courses):
+    params = [target[0], target[1], source[0], source[1]]
+    sql = """
+        SELECT R.course_num, R.core, T.course_num IS NOT NULL AS present, T.core AS target_core
+        FROM requires R
+        LEFT JOIN requires T
+          ON T.degree_name = %s AND T.degree_level = %s AND T.course_num = R.course_num
+        WHERE R.degree_name = %s AND R.degree_level = %s
+    """ + _in_list('R.course_num', courses, params)
+    return sql + " ORDER BY R.course_num", params
+
+
+def _associated_sql(source, target, courses, objectives):
+    params = [target[0], target[1], source[0], source[1]]
+    sql = """
+        SELECT A.course_num, A.obj_code, T.obj_code IS NOT NULL AS present
+        FROM associated A
+        LEFT JOIN associated T
+          ON T.degree_name = %s AND T.degree_level = %s
+         AND T.course_num = A.course_num AND T.obj_code = A.obj_code
+        WHERE A.degree_name = %s AND A.degree_level = %s
+    """ + _in_list('A.course_num', courses, params) + _in_list('A.obj_code', objectives, params)
+    return sql + " ORDER BY A.course_num, A.obj_code", params
+
+
+def curriculum_diff(cursor, source, target, courses=None, objectives=None):
+    """What a clone would add, and what the target already has."""
+    diff = {'requires_new': [], 'requires_present': [], 'associated_new': [], 'associated_present': []}
+
+    cursor.execute(*_requires_sql(source, target, courses))
+    for course_num, core, present, target_core in cursor.fetchall():
+        row = {'course_num': course_num, 'core': bool(core)}
+        if present:
+            row['target_core'] = bool(target_core)
+            diff['requires_present'].append(row)
+        else:
+            diff['requires_new'].append(row)
+
+    cursor.execute(*_associated_sql(source, target, courses, objectives))
+    for course_num, obj_code, present in cursor.fetchall():
+        row = {'course_num': course_num, 'obj_code': obj_code}
+        diff['associated_present' if present else 'associated_new'].append(row)
+    return diff
+
+
+def clone_curriculum(source, target, courses=None, objectives=None, dry_run=False):
+    """
+    Copy requires and associated rows from source to target, both
+    (degree_name, degree_level). courses limits both tables to those course
+    numbers, objectives limits the associated rows to those codes. The target
+    degree is created if it doesn't exist. Returns the diff; with dry_run
+    nothing is written.
+    """
+    if tuple(source) == tuple(target):
+        raise ValueError("Pick two different degrees.")
+
+    def clone(cursor):
+        cursor.execute(
+            "SELECT degree_name FROM degree WHERE degree_name = %s AND degree_level = %s",
+            tuple(source)
+        )
+        if cursor.fetchone() is None:
+            raise ValueError(f"Degree {source[0]} ({source[1]}) doesn't exist.")
+
+        diff = curriculum_diff(cursor, source, target, courses, objectives)
+        if dry_run:
+            return diff
+
+        cursor.execute(
+            """
+            INSERT INTO degree (degree_name, degree_level)
+            SELECT %s, %s FROM DUAL
+            WHERE NOT EXISTS (SELECT 1 FROM degree WHERE degree_name = %s AND degree_level = %s)
+            """,
+            (target[0], target[1], target[0], target[1])
+        )
+        diff['degree_created'] = cursor.rowcount == 1
+
+        params = [target[0], target[1], source[0], source[1]]
+        sql = """
+            INSERT INTO requires (degree_name, degree_level, course_num, core)
+            SELECT %s, %s, R.course_num, R.core
+            FROM requires R
+            WHERE R.degree_name = %s AND R.degree_level = %s
+        """ + _in_list('R.course_num', courses, params)
+        params.extend(target)
+        cursor.execute(sql + """
+              AND NOT EXISTS (SELECT 1 FROM requires T
+                              WHERE T.degree_name = %s AND T.degree_level = %s
+                                AND T.course_num = R.course_num)
+            ORDER BY R.course_num
+        """, params)
+
+        #only links whose course the target requires (the associated -> requires foreign key)
+        params = [target[0], target[1], source[0], source[1]]
+        sql = """
+            INSERT INTO associated (degree_name, degree_level, course_num, obj_code)
+            SELECT %s, %s, A.course_num, A.obj_code
+            FROM associated A
+            WHERE A.degree_name = %s AND A.degree_level = %s
+        """ + _in_list('A.course_num', courses, params) + _in_list('A.obj_code', objectives, params)
+        params.extend(target)
+        params.extend(target)
+        cursor.execute(sql + """
+              AND EXISTS (SELECT 1 FROM requires R
+                          WHERE R.degree_name = %s AND R.degree_level = %s
+                            AND R.course_num = A.course_num)
+              AND NOT EXISTS (SELECT 1 FROM associated T
+                              WHERE T.degree_name = %s AND T.degree_level = %s
+                                AND T.course_num = A.course_num AND T.obj_code = A.obj_code)
+            ORDER BY A.course_num, A.obj_code
+        """, params)
+
+        refresh_degree(cursor, *target)
+        return diff
+
+    diff = run_in_transaction(clone)
+    if not dry_run:
+        bump_tables('degree', 'requires', 'associated', 'instructor_dashboard')
+    return diff
@@ -0,0 +1,130 @@
+"""
+Instructor dashboard read model.
+
+instructor_dashboard holds one row per (instructor, section, degree that
+requires the course) with the objective counts already worked out, so the
+dashboard is a single primary-key range scan. Writers call the refresh_*
+helpers (inside their own transaction where they have one) whenever
+teaches, objective_eval, requires or associated change.
+"""
+from database.handler import run_in_transaction, bump_tables
+from database.archive import year_source
+
+#{section}/{teaches}/{evals} are filled in by year_source, {where} limits the rebuild
+REFRESH_SQL = """
+    INSERT INTO instructor_dashboard
+      (instructor_id, sec_year, sec_term, course_num, sec_num,
+       degree_name, degree_level, course_name, num_students,
+       total_objs, entered_objs, improve_count)
+    SELECT T.instructor_id, S.sec_year, S.sec_term, S.course_num, S.sec_num,
+           COALESCE(R.degree_name, ''), COALESCE(R.degree_level, ''),
+           C.course_name, S.num_students,
+           (SELECT COUNT(*) FROM associated A
+            WHERE A.degree_name = R.degree_name
+              AND A.degree_level = R.degree_level
+              AND A.course_num = S.course_num),
+           (SELECT COUNT(*) FROM {evals} OE
+            JOIN associated A
+              ON A.degree_name = OE.degree_name
+             AND A.degree_level = OE.degree_level
+             AND A.course_num = OE.course_num
+             AND A.obj_code = OE.obj_code
+            WHERE OE.course_num = S.course_num AND OE.sec_num = S.sec_num
+              AND OE.sec_term = S.sec_term AND OE.sec_year = S.sec_year
+              AND OE.degree_name = R.degree_name AND OE.degree_level = R.degree_level),
+           (SELECT COUNT(*) FROM {evals} OE
+            WHERE OE.course_num = S.course_num AND OE.sec_num = S.sec_num
+              AND OE.sec_term = S.sec_term AND OE.sec_year = S.sec_year
+              AND OE.degree_name = R.degree_name AND OE.degree_level = R.degree_level
+              AND OE.improvements IS NOT NULL AND OE.improvements != '')
+    FROM {section} S
+    JOIN {teaches} T
+      ON T.course_num = S.course_num AND T.sec_num = S.sec_num
+     AND T.sec_term = S.sec_term AND T.sec_year = S.sec_year
+    JOIN course C ON C.course_num = S.course_num
+    LEFT JOIN requires R ON R.course_num = S.course_num
+    {where}
+"""
+
+
+def _refresh(cursor, where, params, delete_where, start_year, delete_params=None):
+    cursor.execute(f"DELETE FROM instructor_dashboard {delete_where}", params if delete_params is None else delete_params)
+    cursor.execute(
+        REFRESH_SQL.format(
+            section=year_source('section', start_year),
+            teaches=year_source('teaches', start_year),
+            evals=year_source('objective_eval', start_year),
+            where=where
+        ),
+        params
+    )
+
+
+def refresh_sections(cursor, section_keys):
+    """Rebuild the rows for these (course_num, sec_num, sec_term, sec_year) sections."""
+    for course_num, sec_num, sec_term, sec_year in sorted(set(section_keys)):
+        params = (course_num, sec_num, sec_term, sec_year)
+        _refresh(
+            cursor,
+            "WHERE S.course_num = %s AND S.sec_num = %s AND S.sec_term = %s AND S.sec_year = %s",
+            params,
+            "WHERE course_num = %s AND sec_num = %s AND sec_term = %s AND sec_year = %s",
+            sec_year
+        )
+
+
+def refresh_course(cursor, course_num):
+    """Rebuild every section of a course (after its degree or objective links change)."""
+    _refresh(
+        cursor,
+        "WHERE S.course_num = %s",
+        (course_num,),
+        "WHERE course_num = %s",
+        0
+    )
+
+
+def refresh_degree(cursor, degree_name, degree_level):
+    """Rebuild one degree's rows (after links are added to it in bulk)."""
+    _refresh(
+        cursor,
+        "WHERE R.degree_name = %s AND R.degree_level = %s",
+        (degree_name, degree_level),
+        #also drop the 'no degree' rows of courses that are now linked to it
+        """WHERE (degree_name = %s AND degree_level = %s)
+              OR (degree_name = '' AND course_num IN
+                  (SELECT course_num FROM requires WHERE degree_name = %s AND degree_level = %s))""",
+        0,
+        delete_params=(degree_name, degree_level, degree_name, degree_level)
+    )
+
+
+def refresh_all():
+    """Rebuild the whole read model in one transaction."""
+    def rebuild(cursor):
+        _refresh(cursor, "", (), "", 0)
+        cursor.execute("SELECT COUNT(*) FROM instructor_dashboard")
+        return cursor.fetchone()[0]
+
+    count = run_in_transaction(rebuild)
+    bump_tables('instructor_dashboard')
+    return count
+
+
+#flashed when refresh_now fails after the write it follows was saved
+LAG_MESSAGE = "The instructor dashboard may lag behind until `flask rebuild-dashboard` is run."
+
+
+def refresh_now(refresh, *args):
+    """
+    Run one refresh helper in its own transaction (for writers without one).
+    The write before it has already committed, so a failure is logged and
+    reported as False instead of raised.
+    """
+    try:
+        run_in_transaction(lambda cursor: refresh(cursor, *args))
+    except Exception as e:
+        print(f"Dashboard refresh failed ({refresh.__name__}): {e}")
+        return False
+    bump_tables('instructor_dashboard')
+    return True
@@ -1,53 +1,419 @@
-import mysql.connector
+import os
+import re
+import random
+import threading
+import time
+from collections import namedtuple
 from flask import current_app, g
+from database.cache import get_query_cache, get_generation_store
 
-def connect_db():
-    config = current_app.config['DB_CONFIG']
-    
-    db_config = {
+def connector():
+    """
+    mysql.connector, imported on first use: it is the slowest import at
+    startup and pages/commands that never connect shouldn't pay for it.
+    """
+    import mysql.connector
+    import mysql.connector.pooling
+    return mysql.connector
+
+#per-process connection pool (only used when [database] pool_size is set)
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+#mysql errors meaning the server (or our socket to it) went away
+CONNECTION_LOST_ERRORS = (2006, 2013, 2055)
+
+#deadlock / lock wait timeout: the transaction was rolled back and can simply be rerun
+RETRYABLE_LOCK_ERRORS = (1213, 1205)
+
+#per-process counters read by benchmarks/loadtest_eval_save.py
+transaction_stats = {'transactions': 0, 'retries': 0, 'deadlocks': 0, 'lock_wait_timeouts': 0}
+_stats_lock = threading.Lock()
+
+class DatabaseUnavailable(RuntimeError):
+    """The database is marked down; raised right away instead of waiting on a connect timeout."""
+
+    def __init__(self, retry_after):
+        super().__init__("Database connection failed.")
+        self.retry_after = retry_after
+
+def _db_settings(config):
+    settings = {
         'host': config['host'],
         'user': config['user'],
         'password': config['password'],
-        'database': config['database']
+        'database': config['database'],
+        'connection_timeout': int(config.get('connect_timeout', 5))
     }
+    #read/write timeouts are optional; without them a hung query waits forever
+    if config.get('read_timeout'):
+        settings['read_timeout'] = int(config['read_timeout'])
+    if config.get('write_timeout'):
+        settings['write_timeout'] = int(config['write_timeout'])
+    return settings
+
+#shared (per-process) "database down" state with exponential backoff
+_health = {'failures': 0, 'retry_at': 0.0}
+_health_lock = threading.Lock()
+
+def _backoff(config, failures):
+    initial = float(config.get('backoff_initial', 1))
+    limit = float(config.get('backoff_max', 30))
+    return min(initial * 2 ** (failures - 1), limit)
+
+def _claim_connect_attempt(config):
+    """
+    False while the database is marked down. Once the backoff window ends,
+    exactly one caller gets to probe; everyone else keeps failing fast.
+    """
+    with _health_lock:
+        if _health['failures'] == 0:
+            return True
+        now = time.monotonic()
+        if now < _health['retry_at']:
+            return False
+        _health['retry_at'] = now + _backoff(config, _health['failures'])
+        return True
+
+def _mark_down(config):
+    with _health_lock:
+        _health['failures'] += 1
+        _health['retry_at'] = time.monotonic() + _backoff(config, _health['failures'])
+
+def _mark_up():
+    with _health_lock:
+        _health['failures'] = 0
+        _health['retry_at'] = 0.0
+
+def database_down():
+    """Seconds until the next probe if the database is marked down, else 0."""
+    with _health_lock:
+        if _health['failures'] == 0:
+            return 0
+        return max(_health['retry_at'] - time.monotonic(), 0)
+
+#per-table write counters; caches compare these to know when they are stale.
+#they live in the shared generation store; this dict is only the fallback
+#for when that store can't be opened
+_table_generations = {}
+_generation_lock = threading.Lock()
+_WRITE_TABLE = re.compile(
+    r"^\s*(?:INSERT(?:\s+IGNORE)?\s+INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)",
+    re.IGNORECASE
+)
+
+def _generation_store():
+    try:
+        return get_generation_store(current_app.config)
+    except Exception as e:
+        print(f"Shared table generations unavailable: {e}")
+        return None
+
+def bump_tables(*tables):
+    """Mark tables as changed (call after committing a write); every worker sees the new generation."""
+    store = _generation_store()
+    if store is not None:
+        try:
+            for table in tables:
+                store.incr(table)
+            return
+        except Exception as e:
+            print(f"Table generation error (bump {tables}): {e}")
+    with _generation_lock:
+        for table in tables:
+            _table_generations[table] = _table_generations.get(table, 0) + 1
+
+def table_generation(*tables):
+    """Current write counters for tables, usable as a cache key."""
+    store = _generation_store()
+    if store is not None:
+        try:
+            return tuple(store.counters(list(tables)))
+        except Exception as e:
+            print(f"Table generation error (read): {e}")
+    return tuple(_table_generations.get(table, 0) for table in tables)
+
+def end_read_snapshot():
+    """
+    End the read snapshot left open on the request's connection (autocommit
+    is off, so the first SELECT starts one), so the next read sees every
+    commit so far. Writes are committed where they happen, so this only
+    ever ends reads; don't call it inside run_in_transaction.
+    """
+    conn = g.get('db')
+    if conn is not None and conn.in_transaction:
+        conn.commit()
+
+def _query_cache():
+    try:
+        return get_query_cache(current_app.config)
+    except RuntimeError as e:
+        print(f"Query cache disabled: {e}")
+        return None
+
+def get_pool():
+    """
+    Return this process's connection pool, creating it on first use.
+    The pid check means a forked worker builds its own pool instead of
+    sharing the parent's sockets.
+    """
+    global _pool, _pool_pid
+    config = current_app.config['DB_CONFIG']
+    if not config.get('pool_size'):
+        return None
+
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = connector().pooling.MySQLConnectionPool(
+                    pool_name=f"app_{os.getpid()}",
+                    pool_size=int(config['pool_size']),
+                    **_db_settings(config)
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+def _pooled_connection(pool, timeout):
+    """A pooled connection, waiting up to timeout seconds for one to be returned."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return pool.get_connection()
+        except connector().errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+def connect_db():
+    config = current_app.config['DB_CONFIG']
+    
+    if not _claim_connect_attempt(config):
+        raise DatabaseUnavailable(database_down())
+
+    db_config = _db_settings(config)
     
     try:
-        connection = mysql.connector.connect(**db_config)
+        pool = get_pool()
+        if pool is not None:
+            #the pool reconnects checked-out connections the server dropped while idle
+            connection = _pooled_connection(pool, db_config['connection_timeout'])
+        else:
+            connection = connector().connect(**db_config)
+        _mark_up()
         return connection
-    except mysql.connector.Error as err:
+    except connector().errors.PoolError as err:
+        #every pooled connection is busy; the server is fine, so don't mark it down
+        print(f"Database pool exhausted: {err}")
+        raise DatabaseUnavailable(1) from err
+    except connector().Error as err:
+        _mark_down(config)
         print(f"FATAL DATABASE ERROR: Could not connect to the database. Error: {err}")
-        raise RuntimeError("Database connection failed.") from err
+        raise DatabaseUnavailable(database_down()) from err
+
+def warm_pool():
+    """Open every pooled connection once so the first requests don't pay for connecting."""
+    pool = get_pool()
+    if pool is None:
+        return 0
+    connections = []
+    try:
+        for _ in range(pool.pool_size):
+            conn = connect_db()
+            conn.ping(reconnect=True)
+            connections.append(conn)
+    finally:
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+def _reconnect(conn, dictionary):
+    config = current_app.config['DB_CONFIG']
+    try:
+        conn.reconnect(attempts=1, delay=0)
+    except connector().Error:
+        _mark_down(config)
+        raise
+    return conn.cursor(dictionary=dictionary)
 
 def get_db_connection_for_request():
     if 'db' not in g:
         g.db = connect_db()
     return g.db
 
-def execute_query(sql, params=None, fetch_one=False):
+#one record class per column list, reused across queries
+_row_classes = {}
+
+def _row_class(columns):
+    row_class = _row_classes.get(columns)
+    if row_class is None:
+        row_class = namedtuple('Row', columns, rename=True)
+        _row_classes[columns] = row_class
+    return row_class
+
+def _shape_rows(columns, rows, row_mode, fetch_one):
+    """Turn raw tuples into dict rows or named-tuple rows."""
+    if row_mode == 'tuple':
+        make = _row_class(columns)._make
+    else:
+        make = lambda row: dict(zip(columns, row))
+    if fetch_one:
+        return make(rows[0]) if rows else None
+    return [make(row) for row in rows]
+
+def execute_query(sql, params=None, fetch_one=False, row_mode='dict'):
+    """
+    Run one statement on the request's connection.
+    SELECTs return rows: dicts by default, or with row_mode='tuple'
+    lightweight named tuples (no per-row dict; row.col still works in
+    Jinja). With a [cache] configured, SELECT results outside an open
+    transaction are served from the shared query cache. Other statements are committed and return the row
+    count.
+    """
+    is_select = sql.strip().upper().startswith('SELECT')
+    cache = _query_cache() if is_select else None
+    cache_key = None
+    #inside an open transaction the SELECT reads that transaction's snapshot, which
+    #can be older than the current generations; only cache reads that start a fresh one
+    open_conn = g.get('db')
+    if cache is not None and (open_conn is None or not open_conn.in_transaction):
+        try:
+            cache_key = cache.key(sql, params, 'rows')
+            hit = cache.get(cache_key)
+            if hit is not None:
+                columns, rows = hit
+                return _shape_rows(columns, rows, row_mode, fetch_one)
+        except Exception as e:
+            print(f"Query cache error (read): {e}")
+            cache_key = None
+
     conn = get_db_connection_for_request()
     
-    cursor = conn.cursor(dictionary=True) 
+    #cached reads keep raw tuples so the cached value doesn't depend on row_mode
+    use_dict_cursor = row_mode == 'dict' and cache_key is None
+    cursor = conn.cursor(dictionary=use_dict_cursor)
     
     try:
-        cursor.execute(sql, params or ())
+        try:
+            cursor.execute(sql, params or ())
+        except connector().Error as err:
+            #connection dropped between requests: reconnect once and rerun a read
+            if not is_select or err.errno not in CONNECTION_LOST_ERRORS:
+                raise
+            cursor = _reconnect(conn, use_dict_cursor)
+            cursor.execute(sql, params or ())
         
-        if sql.strip().upper().startswith('SELECT'):
+        if is_select:
+            if cache_key is not None:
+                columns = tuple(cursor.column_names)
+                rows = cursor.fetchall()
+                #end the snapshot this read opened, so the next read can be cached too
+                conn.commit()
+                try:
+                    cache.set(cache_key, (columns, rows))
+                except Exception as e:
+                    print(f"Query cache error (write): {e}")
+                return _shape_rows(columns, rows, row_mode, fetch_one)
             if fetch_one:
                 result = cursor.fetchone()
             else:
                 result = cursor.fetchall()
+            if row_mode == 'tuple':
+                row_class = _row_class(tuple(cursor.column_names))
+                if fetch_one:
+                    return row_class._make(result) if result is not None else None
+                return [row_class._make(row) for row in result]
             return result
         
         conn.commit()
+        written = _WRITE_TABLE.match(sql)
+        if written:
+            bump_tables(written.group(1).lower())
         return cursor.rowcount 
         
-    except mysql.connector.Error as err:
-        conn.rollback()
+    except connector().Error as err:
+        if conn.is_connected():
+            conn.rollback()
         print(f"SQL Error executing query: {sql} with params {params}. Error: {err}")
         raise err
     finally:
         cursor.close()
 
+def iter_query(sql, params=None, row_mode='tuple', batch_size=500):
+    """
+    Run a SELECT on an unbuffered cursor and return an iterator over its rows.
+    The statement runs right away (so errors surface in the caller), but rows
+    are pulled from the server batch by batch as the iterator is consumed.
+    Nothing else may use the request's connection until the iterator is done.
+    """
+    conn = get_db_connection_for_request()
+    cursor = conn.cursor(dictionary=(row_mode == 'dict'))
+    try:
+        cursor.execute(sql, params or ())
+    except connector().Error as err:
+        cursor.close()
+        print(f"SQL Error executing query: {sql} with params {params}. Error: {err}")
+        raise err
+
+    def rows():
+        try:
+            row_class = None
+            if row_mode == 'tuple':
+                row_class = _row_class(tuple(cursor.column_names))
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                if row_class is not None:
+                    for row in batch:
+                        yield row_class._make(row)
+                else:
+                    yield from batch
+        finally:
+            #drain whatever the reader didn't consume so the connection stays usable
+            if conn.unread_result:
+                conn.consume_results()
+            cursor.close()
+
+    return rows()
+
+def _count(name):
+    with _stats_lock:
+        transaction_stats[name] += 1
+
+def run_in_transaction(work, attempts=None):
+    """
+    Call work(cursor) inside one transaction on the request's connection and
+    commit. A deadlock or lock wait timeout rolls back and reruns work (after
+    a short random backoff) up to [database] deadlock_retries times, so work
+    must only touch the database. Any other error rolls back and is raised.
+    """
+    conn = get_db_connection_for_request()
+    if attempts is None:
+        attempts = int(current_app.config['DB_CONFIG'].get('deadlock_retries', 3)) + 1
+
+    _count('transactions')
+    for attempt in range(1, attempts + 1):
+        cursor = conn.cursor()
+        try:
+            result = work(cursor)
+            conn.commit()
+            return result
+        except connector().Error as err:
+            if conn.is_connected():
+                conn.rollback()
+            if err.errno not in RETRYABLE_LOCK_ERRORS or attempt == attempts:
+                raise
+            _count('deadlocks' if err.errno == 1213 else 'lock_wait_timeouts')
+            _count('retries')
+            time.sleep(random.uniform(0, 0.02 * 2 ** attempt))
+        except Exception:
+            if conn.is_connected():
+                conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
 def insert_data(table_name, data):
     columns = ', '.join(data.keys())
     # Use '%s' as the placeholder for mysql.connector
@@ -58,5 +424,9 @@ def insert_data(table_name, data):
     
     return execute_query(sql, values)
 
+def escape_like(value):
+    """Escape LIKE wildcards so user input only matches literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
 # NOTE: The get_db_connection_for_request and execute_query 
 # functions must be imported into app.py and routes/*.py.
\ No newline at end of file
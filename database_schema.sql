@@ -1,3 +1,4 @@
+-- Load this file once, then run `flask --app app migrate` to apply migrations/.
 CREATE DATABASE db_groupproj;
 USE db_groupproj;
 
@@ -0,0 +1,3 @@
+-- full-text indexes used by the /query/search page
+ALTER TABLE learning_objective ADD FULLTEXT INDEX ft_objective_text (title, description);
+ALTER TABLE course ADD FULLTEXT INDEX ft_course_name (course_name);
@@ -0,0 +1,3 @@
+-- b-tree indexes for the prefix lookups behind /api/*
+ALTER TABLE course ADD INDEX idx_course_name (course_name);
+ALTER TABLE instructor ADD INDEX idx_instructor_name (instructor_name);
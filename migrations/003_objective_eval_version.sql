@@ -0,0 +1,2 @@
+-- row version for optimistic concurrency on evaluation edits
+ALTER TABLE objective_eval ADD COLUMN version INT NOT NULL DEFAULT 1;
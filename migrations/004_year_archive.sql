@@ -0,0 +1,14 @@
+-- year indexes for the range filters every report uses
+ALTER TABLE section ADD INDEX idx_section_year (sec_year, sec_term);
+ALTER TABLE teaches ADD INDEX idx_teaches_year (sec_year, sec_term);
+ALTER TABLE objective_eval ADD INDEX idx_objective_eval_year (sec_year, sec_term);
+-- closed academic years are moved here by `flask --app app archive-years`
+-- (CREATE TABLE ... LIKE copies columns and indexes but not foreign keys)
+CREATE TABLE section_archive LIKE section;
+CREATE TABLE teaches_archive LIKE teaches;
+CREATE TABLE objective_eval_archive LIKE objective_eval;
+CREATE TABLE archive_state (
+    id TINYINT PRIMARY KEY,
+    archived_through YEAR NULL
+);
+INSERT INTO archive_state (id, archived_through) VALUES (1, NULL);
@@ -0,0 +1,19 @@
+-- denormalized read model behind /evaluation/dashboard, one row per
+-- (instructor, section, degree); kept fresh by database/dashboard.py
+-- after applying, fill it once with `flask --app app rebuild-dashboard`
+CREATE TABLE instructor_dashboard (
+    instructor_id VARCHAR(8),
+    sec_year YEAR,
+    sec_term VARCHAR(6),
+    course_num VARCHAR(8),
+    sec_num VARCHAR(3),
+    degree_name VARCHAR(30),
+    degree_level VARCHAR(5),
+    course_name VARCHAR(30),
+    num_students INT,
+    total_objs INT,
+    entered_objs INT,
+    improve_count INT,
+    PRIMARY KEY (instructor_id, sec_year, sec_term, course_num, sec_num, degree_name, degree_level),
+    INDEX idx_dashboard_section (course_num, sec_num, sec_term, sec_year)
+);
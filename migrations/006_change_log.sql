@@ -0,0 +1,146 @@
+-- ordered change feed for downstream consumers (read with /api/changes or `flask changes`)
+-- rows are written by the triggers below, so every write path -- forms, imports,
+-- INSERT ... SELECT, archiving -- logs in the same transaction as the change.
+-- source is 'app' unless the session sets @change_source (archive-years uses 'archive').
+-- updates log the old key as row_key and the new row as row_data; they skip no-op updates (e.g. ON DUPLICATE KEY UPDATE x = x).
+-- changed_at is SYSDATE(6), the time the row was logged: a DEFAULT (like NOW()) is the start of the
+-- triggering statement, which for a long statement can be well before its later ids were handed out.
+-- (so don't run the server with --sysdate-is-now)
+-- creating triggers with binary logging on needs SUPER or log_bin_trust_function_creators=1
+CREATE TABLE change_log (
+    change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    changed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    table_name VARCHAR(32) NOT NULL,
+    op CHAR(1) NOT NULL,
+    row_key JSON NOT NULL,
+    row_data JSON NULL,
+    source VARCHAR(16) NOT NULL DEFAULT 'app',
+    -- finds the recent rows that may follow an unsettled gap (services/changes.py)
+    KEY change_log_changed_at (changed_at)
+);
+
+-- degree
+CREATE TRIGGER degree_change_insert AFTER INSERT ON degree FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'degree', 'I', JSON_OBJECT('degree_name', NEW.degree_name, 'degree_level', NEW.degree_level), JSON_OBJECT('degree_name', NEW.degree_name, 'degree_level', NEW.degree_level), COALESCE(@change_source, 'app'));
+
+CREATE TRIGGER degree_change_update AFTER UPDATE ON degree FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+SELECT SYSDATE(6), 'degree', 'U', JSON_OBJECT('degree_name', OLD.degree_name, 'degree_level', OLD.degree_level), JSON_OBJECT('degree_name', NEW.degree_name, 'degree_level', NEW.degree_level), COALESCE(@change_source, 'app')
+FROM DUAL WHERE NOT (OLD.degree_name <=> NEW.degree_name AND OLD.degree_level <=> NEW.degree_level);
+
+CREATE TRIGGER degree_change_delete AFTER DELETE ON degree FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'degree', 'D', JSON_OBJECT('degree_name', OLD.degree_name, 'degree_level', OLD.degree_level), NULL, COALESCE(@change_source, 'app'));
+
+-- course
+CREATE TRIGGER course_change_insert AFTER INSERT ON course FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'course', 'I', JSON_OBJECT('course_num', NEW.course_num), JSON_OBJECT('course_num', NEW.course_num, 'course_name', NEW.course_name), COALESCE(@change_source, 'app'));
+
+CREATE TRIGGER course_change_update AFTER UPDATE ON course FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+SELECT SYSDATE(6), 'course', 'U', JSON_OBJECT('course_num', OLD.course_num), JSON_OBJECT('course_num', NEW.course_num, 'course_name', NEW.course_name), COALESCE(@change_source, 'app')
+FROM DUAL WHERE NOT (OLD.course_num <=> NEW.course_num AND OLD.course_name <=> NEW.course_name);
+
+CREATE TRIGGER course_change_delete AFTER DELETE ON course FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'course', 'D', JSON_OBJECT('course_num', OLD.course_num), NULL, COALESCE(@change_source, 'app'));
+
+-- instructor
+CREATE TRIGGER instructor_change_insert AFTER INSERT ON instructor FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'instructor', 'I', JSON_OBJECT('instructor_id', NEW.instructor_id), JSON_OBJECT('instructor_id', NEW.instructor_id, 'instructor_name', NEW.instructor_name), COALESCE(@change_source, 'app'));
+
+CREATE TRIGGER instructor_change_update AFTER UPDATE ON instructor FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+SELECT SYSDATE(6), 'instructor', 'U', JSON_OBJECT('instructor_id', OLD.instructor_id), JSON_OBJECT('instructor_id', NEW.instructor_id, 'instructor_name', NEW.instructor_name), COALESCE(@change_source, 'app')
+FROM DUAL WHERE NOT (OLD.instructor_id <=> NEW.instructor_id AND OLD.instructor_name <=> NEW.instructor_name);
+
+CREATE TRIGGER instructor_change_delete AFTER DELETE ON instructor FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'instructor', 'D', JSON_OBJECT('instructor_id', OLD.instructor_id), NULL, COALESCE(@change_source, 'app'));
+
+-- learning_objective
+CREATE TRIGGER learning_objective_change_insert AFTER INSERT ON learning_objective FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'learning_objective', 'I', JSON_OBJECT('obj_code', NEW.obj_code), JSON_OBJECT('obj_code', NEW.obj_code, 'title', NEW.title, 'description', NEW.description), COALESCE(@change_source, 'app'));
+
+CREATE TRIGGER learning_objective_change_update AFTER UPDATE ON learning_objective FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+SELECT SYSDATE(6), 'learning_objective', 'U', JSON_OBJECT('obj_code', OLD.obj_code), JSON_OBJECT('obj_code', NEW.obj_code, 'title', NEW.title, 'description', NEW.description), COALESCE(@change_source, 'app')
+FROM DUAL WHERE NOT (OLD.obj_code <=> NEW.obj_code AND OLD.title <=> NEW.title AND OLD.description <=> NEW.description);
+
+CREATE TRIGGER learning_objective_change_delete AFTER DELETE ON learning_objective FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'learning_objective', 'D', JSON_OBJECT('obj_code', OLD.obj_code), NULL, COALESCE(@change_source, 'app'));
+
+-- requires
+CREATE TRIGGER requires_change_insert AFTER INSERT ON requires FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'requires', 'I', JSON_OBJECT('degree_name', NEW.degree_name, 'degree_level', NEW.degree_level, 'course_num', NEW.course_num), JSON_OBJECT('degree_name', NEW.degree_name, 'degree_level', NEW.degree_level, 'course_num', NEW.course_num, 'core', NEW.core), COALESCE(@change_source, 'app'));
+
+CREATE TRIGGER requires_change_update AFTER UPDATE ON requires FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+SELECT SYSDATE(6), 'requires', 'U', JSON_OBJECT('degree_name', OLD.degree_name, 'degree_level', OLD.degree_level, 'course_num', OLD.course_num), JSON_OBJECT('degree_name', NEW.degree_name, 'degree_level', NEW.degree_level, 'course_num', NEW.course_num, 'core', NEW.core), COALESCE(@change_source, 'app')
+FROM DUAL WHERE NOT (OLD.degree_name <=> NEW.degree_name AND OLD.degree_level <=> NEW.degree_level AND OLD.course_num <=> NEW.course_num AND OLD.core <=> NEW.core);
+
+CREATE TRIGGER requires_change_delete AFTER DELETE ON requires FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'requires', 'D', JSON_OBJECT('degree_name', OLD.degree_name, 'degree_level', OLD.degree_level, 'course_num', OLD.course_num), NULL, COALESCE(@change_source, 'app'));
+
+-- section
+CREATE TRIGGER section_change_insert AFTER INSERT ON section FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'section', 'I', JSON_OBJECT('sec_num', NEW.sec_num, 'course_num', NEW.course_num, 'sec_term', NEW.sec_term, 'sec_year', NEW.sec_year), JSON_OBJECT('sec_num', NEW.sec_num, 'course_num', NEW.course_num, 'sec_term', NEW.sec_term, 'sec_year', NEW.sec_year, 'num_students', NEW.num_students), COALESCE(@change_source, 'app'));
+
+CREATE TRIGGER section_change_update AFTER UPDATE ON section FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+SELECT SYSDATE(6), 'section', 'U', JSON_OBJECT('sec_num', OLD.sec_num, 'course_num', OLD.course_num, 'sec_term', OLD.sec_term, 'sec_year', OLD.sec_year), JSON_OBJECT('sec_num', NEW.sec_num, 'course_num', NEW.course_num, 'sec_term', NEW.sec_term, 'sec_year', NEW.sec_year, 'num_students', NEW.num_students), COALESCE(@change_source, 'app')
+FROM DUAL WHERE NOT (OLD.sec_num <=> NEW.sec_num AND OLD.course_num <=> NEW.course_num AND OLD.sec_term <=> NEW.sec_term AND OLD.sec_year <=> NEW.sec_year AND OLD.num_students <=> NEW.num_students);
+
+CREATE TRIGGER section_change_delete AFTER DELETE ON section FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'section', 'D', JSON_OBJECT('sec_num', OLD.sec_num, 'course_num', OLD.course_num, 'sec_term', OLD.sec_term, 'sec_year', OLD.sec_year), NULL, COALESCE(@change_source, 'app'));
+
+-- teaches
+CREATE TRIGGER teaches_change_insert AFTER INSERT ON teaches FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'teaches', 'I', JSON_OBJECT('sec_num', NEW.sec_num, 'course_num', NEW.course_num, 'instructor_id', NEW.instructor_id, 'sec_term', NEW.sec_term, 'sec_year', NEW.sec_year), JSON_OBJECT('sec_num', NEW.sec_num, 'course_num', NEW.course_num, 'instructor_id', NEW.instructor_id, 'sec_term', NEW.sec_term, 'sec_year', NEW.sec_year), COALESCE(@change_source, 'app'));
+
+CREATE TRIGGER teaches_change_update AFTER UPDATE ON teaches FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+SELECT SYSDATE(6), 'teaches', 'U', JSON_OBJECT('sec_num', OLD.sec_num, 'course_num', OLD.course_num, 'instructor_id', OLD.instructor_id, 'sec_term', OLD.sec_term, 'sec_year', OLD.sec_year), JSON_OBJECT('sec_num', NEW.sec_num, 'course_num', NEW.course_num, 'instructor_id', NEW.instructor_id, 'sec_term', NEW.sec_term, 'sec_year', NEW.sec_year), COALESCE(@change_source, 'app')
+FROM DUAL WHERE NOT (OLD.sec_num <=> NEW.sec_num AND OLD.course_num <=> NEW.course_num AND OLD.instructor_id <=> NEW.instructor_id AND OLD.sec_term <=> NEW.sec_term AND OLD.sec_year <=> NEW.sec_year);
+
+CREATE TRIGGER teaches_change_delete AFTER DELETE ON teaches FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'teaches', 'D', JSON_OBJECT('sec_num', OLD.sec_num, 'course_num', OLD.course_num, 'instructor_id', OLD.instructor_id, 'sec_term', OLD.sec_term, 'sec_year', OLD.sec_year), NULL, COALESCE(@change_source, 'app'));
+
+-- associated
+CREATE TRIGGER associated_change_insert AFTER INSERT ON associated FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'associated', 'I', JSON_OBJECT('degree_name', NEW.degree_name, 'degree_level', NEW.degree_level, 'course_num', NEW.course_num, 'obj_code', NEW.obj_code), JSON_OBJECT('degree_name', NEW.degree_name, 'degree_level', NEW.degree_level, 'course_num', NEW.course_num, 'obj_code', NEW.obj_code), COALESCE(@change_source, 'app'));
+
+CREATE TRIGGER associated_change_update AFTER UPDATE ON associated FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+SELECT SYSDATE(6), 'associated', 'U', JSON_OBJECT('degree_name', OLD.degree_name, 'degree_level', OLD.degree_level, 'course_num', OLD.course_num, 'obj_code', OLD.obj_code), JSON_OBJECT('degree_name', NEW.degree_name, 'degree_level', NEW.degree_level, 'course_num', NEW.course_num, 'obj_code', NEW.obj_code), COALESCE(@change_source, 'app')
+FROM DUAL WHERE NOT (OLD.degree_name <=> NEW.degree_name AND OLD.degree_level <=> NEW.degree_level AND OLD.course_num <=> NEW.course_num AND OLD.obj_code <=> NEW.obj_code);
+
+CREATE TRIGGER associated_change_delete AFTER DELETE ON associated FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'associated', 'D', JSON_OBJECT('degree_name', OLD.degree_name, 'degree_level', OLD.degree_level, 'course_num', OLD.course_num, 'obj_code', OLD.obj_code), NULL, COALESCE(@change_source, 'app'));
+
+-- objective_eval
+CREATE TRIGGER objective_eval_change_insert AFTER INSERT ON objective_eval FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'objective_eval', 'I', JSON_OBJECT('sec_num', NEW.sec_num, 'sec_term', NEW.sec_term, 'sec_year', NEW.sec_year, 'obj_code', NEW.obj_code, 'degree_name', NEW.degree_name, 'degree_level', NEW.degree_level, 'course_num', NEW.course_num), JSON_OBJECT('sec_num', NEW.sec_num, 'sec_term', NEW.sec_term, 'sec_year', NEW.sec_year, 'obj_code', NEW.obj_code, 'degree_name', NEW.degree_name, 'degree_level', NEW.degree_level, 'course_num', NEW.course_num, 'based_on', NEW.based_on, 'perform_a', NEW.perform_a, 'perform_b', NEW.perform_b, 'perform_c', NEW.perform_c, 'perform_f', NEW.perform_f, 'improvements', NEW.improvements, 'version', NEW.version), COALESCE(@change_source, 'app'));
+
+CREATE TRIGGER objective_eval_change_update AFTER UPDATE ON objective_eval FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+SELECT SYSDATE(6), 'objective_eval', 'U', JSON_OBJECT('sec_num', OLD.sec_num, 'sec_term', OLD.sec_term, 'sec_year', OLD.sec_year, 'obj_code', OLD.obj_code, 'degree_name', OLD.degree_name, 'degree_level', OLD.degree_level, 'course_num', OLD.course_num), JSON_OBJECT('sec_num', NEW.sec_num, 'sec_term', NEW.sec_term, 'sec_year', NEW.sec_year, 'obj_code', NEW.obj_code, 'degree_name', NEW.degree_name, 'degree_level', NEW.degree_level, 'course_num', NEW.course_num, 'based_on', NEW.based_on, 'perform_a', NEW.perform_a, 'perform_b', NEW.perform_b, 'perform_c', NEW.perform_c, 'perform_f', NEW.perform_f, 'improvements', NEW.improvements, 'version', NEW.version), COALESCE(@change_source, 'app')
+FROM DUAL WHERE NOT (OLD.sec_num <=> NEW.sec_num AND OLD.sec_term <=> NEW.sec_term AND OLD.sec_year <=> NEW.sec_year AND OLD.obj_code <=> NEW.obj_code AND OLD.degree_name <=> NEW.degree_name AND OLD.degree_level <=> NEW.degree_level AND OLD.course_num <=> NEW.course_num AND OLD.based_on <=> NEW.based_on AND OLD.perform_a <=> NEW.perform_a AND OLD.perform_b <=> NEW.perform_b AND OLD.perform_c <=> NEW.perform_c AND OLD.perform_f <=> NEW.perform_f AND OLD.improvements <=> NEW.improvements AND OLD.version <=> NEW.version);
+
+CREATE TRIGGER objective_eval_change_delete AFTER DELETE ON objective_eval FOR EACH ROW
+INSERT INTO change_log (changed_at, table_name, op, row_key, row_data, source)
+VALUES (SYSDATE(6), 'objective_eval', 'D', JSON_OBJECT('sec_num', OLD.sec_num, 'sec_term', OLD.sec_term, 'sec_year', OLD.sec_year, 'obj_code', OLD.obj_code, 'degree_name', OLD.degree_name, 'degree_level', OLD.degree_level, 'course_num', OLD.course_num), NULL, COALESCE(@change_source, 'app'));
@@ -0,0 +1,18 @@
+-- data-integrity audit results, one row per (term, check); written by services/audit.py
+-- run it with `flask --app app audit` or from /admin/audit
+CREATE TABLE audit_result (
+    sec_year YEAR,
+    sec_term VARCHAR(6),
+    check_name VARCHAR(32),
+    anomalies INT NOT NULL,
+    samples JSON NULL,
+    audited_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (sec_year, sec_term, check_name)
+);
+-- change_log cursor of the last full/incremental audit (NULL: never run, so the next run is full)
+CREATE TABLE audit_state (
+    id TINYINT PRIMARY KEY,
+    last_change_id BIGINT NULL,
+    audited_at TIMESTAMP NULL
+);
+INSERT INTO audit_state (id, last_change_id, audited_at) VALUES (1, NULL, NULL);
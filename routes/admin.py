@@ -0,0 +1,52 @@
+from flask import Blueprint, render_template, current_app, send_file, abort, request, redirect, url_for, flash
+from services.audit import run_audit, audit_report
+
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin', template_folder='../templates')
+
+#blueprint for maintenance pages
+@admin_bp.route('/profiles', methods=['GET'])
+def profiles():
+    """Slowest recent profiled requests, with SQL / template / Python split."""
+    store = current_app.extensions['profiling']
+    return render_template(
+        'admin/profiles.html',
+        enabled=current_app.config.get('PROFILING', {}).get('enabled', 'false').lower() in ('1', 'true', 'yes', 'on'),
+        directory=store.directory,
+        records=store.slowest()
+    )
+
+
+@admin_bp.route('/profiles/<profile_id>.folded', methods=['GET'])
+def profile_stacks(profile_id):
+    """Collapsed stacks for one request (input for flamegraph.pl or speedscope)."""
+    path = current_app.extensions['profiling'].folded_path(profile_id)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=f"{profile_id}.folded")
+
+
+@admin_bp.route('/audit', methods=['GET', 'POST'])
+def audit():
+    """Data-integrity audit: stored anomaly counts with sample keys; POST re-audits."""
+    if request.method == 'POST':
+        sec_term = request.form.get('sec_term', '').strip()
+        sec_year = request.form.get('sec_year', '').strip()
+        if bool(sec_term) != bool(sec_year) or (sec_year and not sec_year.isdigit()):
+            flash('Pick both a term and a year, or neither.', 'error')
+            return redirect(url_for('admin.audit'))
+        terms = [(int(sec_year), sec_term)] if sec_term else None
+        #a handful of set-based queries, so it runs inline rather than as a job
+        result = run_audit(full=request.form.get('full') == 'on', terms=terms)
+        flash(
+            f"Audited {len(result['terms'])} term(s) in {result['seconds']} s: "
+            f"{result['anomalies']} anomal{'y' if result['anomalies'] == 1 else 'ies'} found.",
+            'success' if result['anomalies'] == 0 else 'error'
+        )
+        return redirect(url_for('admin.audit'))
+
+    return render_template(
+        'admin/audit.html',
+        report=audit_report(),
+        terms=['Spring', 'Summer', 'Fall']
+    )
@@ -0,0 +1,150 @@
+from flask import Blueprint, request, jsonify
+from database.handler import execute_query, escape_like
+from services.changes import read_changes, TABLES
+
+#blueprint for small json endpoints used by the forms
+api_bp = Blueprint('api', __name__, url_prefix='/api')
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+#change feed pages are bigger
+CHANGES_DEFAULT_LIMIT = 1000
+CHANGES_MAX_LIMIT = 5000
+
+
+def _lookup_args():
+    """
+    Read the typed prefix and result limit from the query string. The prefix
+    is None when nothing was typed: a bare '%' would make the unions below
+    build the whole table before LIMIT.
+    """
+    q = (request.args.get('q') or '').strip()
+    prefix = escape_like(q) + '%' if q else None
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    return prefix, min(max(limit, 1), MAX_LIMIT)
+
+
+@api_bp.route('/courses')
+def courses():
+    """Courses whose number or name starts with ?q= (optionally only degree-linked ones)."""
+    prefix, limit = _lookup_args()
+    if prefix is None:
+        return jsonify([])
+    #each branch of the union can use its own index
+    if request.args.get('linked'):
+        sql = """
+            SELECT C.course_num, C.course_name
+            FROM course C
+            WHERE C.course_num LIKE %s
+              AND EXISTS (SELECT 1 FROM requires R WHERE R.course_num = C.course_num)
+            UNION
+            SELECT C.course_num, C.course_name
+            FROM course C
+            WHERE C.course_name LIKE %s
+              AND EXISTS (SELECT 1 FROM requires R WHERE R.course_num = C.course_num)
+            ORDER BY course_num
+            LIMIT %s
+        """
+    else:
+        sql = """
+            SELECT course_num, course_name FROM course WHERE course_num LIKE %s
+            UNION
+            SELECT course_num, course_name FROM course WHERE course_name LIKE %s
+            ORDER BY course_num
+            LIMIT %s
+        """
+    rows = execute_query(sql, (prefix, prefix, limit))
+    return jsonify([
+        {'value': r['course_num'], 'label': f"{r['course_num']} - {r['course_name']}"}
+        for r in rows
+    ])
+
+
+@api_bp.route('/instructors')
+def instructors():
+    """Instructors whose name or id starts with ?q=."""
+    prefix, limit = _lookup_args()
+    if prefix is None:
+        return jsonify([])
+    sql = """
+        SELECT instructor_id, instructor_name FROM instructor WHERE instructor_name LIKE %s
+        UNION
+        SELECT instructor_id, instructor_name FROM instructor WHERE instructor_id LIKE %s
+        ORDER BY instructor_name
+        LIMIT %s
+    """
+    rows = execute_query(sql, (prefix, prefix, limit))
+    return jsonify([
+        {'value': r['instructor_id'], 'label': f"{r['instructor_name']} (ID: {r['instructor_id']})"}
+        for r in rows
+    ])
+
+
+@api_bp.route('/degrees')
+def degrees():
+    """Degrees whose name starts with ?q=; value is 'name|level' like the old dropdowns."""
+    prefix, limit = _lookup_args()
+    #few rows and one index range, so an empty prefix just lists the first ones
+    prefix = prefix or '%'
+    sql = """
+        SELECT degree_name, degree_level FROM degree
+        WHERE degree_name LIKE %s
+        ORDER BY degree_name, degree_level
+        LIMIT %s
+    """
+    rows = execute_query(sql, (prefix, limit))
+    return jsonify([
+        {
+            'value': f"{r['degree_name']}|{r['degree_level']}",
+            'label': f"{r['degree_name']} ({r['degree_level']})"
+        }
+        for r in rows
+    ])
+
+
+@api_bp.route('/objectives')
+def objectives():
+    """Learning objectives whose code or title starts with ?q=."""
+    prefix, limit = _lookup_args()
+    if prefix is None:
+        return jsonify([])
+    sql = """
+        SELECT obj_code, title FROM learning_objective WHERE obj_code LIKE %s
+        UNION
+        SELECT obj_code, title FROM learning_objective WHERE title LIKE %s
+        ORDER BY obj_code
+        LIMIT %s
+    """
+    rows = execute_query(sql, (prefix, prefix, limit))
+    return jsonify([
+        {'value': r['obj_code'], 'label': f"{r['obj_code']} - {r['title']}"}
+        for r in rows
+    ])
+
+
+@api_bp.route('/changes')
+def changes():
+    """
+    Ordered change feed: rows written to any table after ?since=<cursor>.
+    Pass back the returned "next" as since; keep reading while "more" is true.
+    Optional ?tables=objective_eval,section and ?limit=.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', CHANGES_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'since and limit must be whole numbers'}), 400
+    tables = [t for t in (request.args.get('tables') or '').split(',') if t]
+    unknown = [t for t in tables if t not in TABLES]
+    if unknown:
+        return jsonify({'error': f"unknown table(s): {', '.join(unknown)}"}), 400
+
+    return jsonify(read_changes(
+        since=max(since, 0),
+        limit=min(max(limit, 1), CHANGES_MAX_LIMIT),
+        tables=tables or None
+    ))
@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database.handler import execute_query, insert_data
+from database.handler import execute_query, insert_data, DatabaseUnavailable
+from database.dashboard import refresh_now, refresh_sections, refresh_course, LAG_MESSAGE
+from database.curriculum import clone_curriculum
 
 # Blueprint for all data entry related routes
 data_entry_bp = Blueprint(
@@ -37,6 +39,8 @@ def add_degree():
             flash(f'Degree added: {name} ({level})', 'success')
             return redirect(url_for('data_entry.add_degree'))
         
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             # Catch database constraint errors (e.g., duplicates)
             flash(
@@ -71,6 +75,8 @@ def add_course():
             flash(f'Course added: {course_num} - {course_name}', 'success')
             return redirect(url_for('data_entry.add_course'))
         
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             # Handles duplicate course numbers or database issues
             flash(
@@ -104,6 +110,8 @@ def add_instructor():
             flash(f'Instructor added: {instr_name} (ID: {instr_id})', 'success')
             return redirect(url_for('data_entry.add_instructor'))
         
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             # Likely caused by duplicate instructor IDs
             flash(
@@ -138,6 +146,8 @@ def add_objective():
             flash(f'Objective added: {obj_code} - {title}', 'success')
             return redirect(url_for('data_entry.add_objective'))
         
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             # Handles duplicate objectives or constraint violations
             flash(
@@ -154,13 +164,7 @@ def add_objective():
 @data_entry_bp.route('/associate_degree_course', methods=['GET', 'POST'])
 def associate_course_to_degree():
     # Links a course to a degree and optionally marks it as core
-    degrees = execute_query(
-        "SELECT degree_name, degree_level FROM degree ORDER BY degree_name"
-    )
-    courses = execute_query(
-        "SELECT course_num, course_name FROM course ORDER BY course_num"
-    )
-
+    # (degree and course options are loaded as you type from /api)
     if request.method == 'POST':
         try:
             # Read degree and course selection from hidden inputs
@@ -178,14 +182,20 @@ def associate_course_to_degree():
                 'core': is_core
             }
             insert_data('requires', data)
+            # Existing sections of the course now count toward this degree
+            refreshed = refresh_now(refresh_course, course_num)
 
             flash(
                 f'Course {course_num} linked to {degree_name} {degree_level}. '
                 f'Core: {is_core}.',
                 'success'
             )
+            if not refreshed:
+                flash(LAG_MESSAGE, 'error')
             return redirect(url_for('data_entry.associate_course_to_degree'))
         
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             # Handles invalid links or duplicate relationships
             flash(
@@ -194,28 +204,15 @@ def associate_course_to_degree():
                 f'Details: {e}',
                 'error'
             )
-            return render_template(
-                'data_entry/associate_course_to_degree.html',
-                degrees=degrees,
-                courses=courses
-            )
+            return render_template('data_entry/associate_course_to_degree.html')
 
-    return render_template(
-        'data_entry/associate_course_to_degree.html',
-        degrees=degrees,
-        courses=courses
-    )
+    return render_template('data_entry/associate_course_to_degree.html')
 
 
 @data_entry_bp.route('/section', methods=['GET', 'POST'])
 def add_section():
     # Adds a course section and assigns an instructor
-    courses = execute_query(
-        "SELECT course_num, course_name FROM course ORDER BY course_num"
-    )
-    instructors = execute_query(
-        "SELECT instructor_id, instructor_name FROM instructor ORDER BY instructor_name"
-    )
+    # (course and instructor options are loaded as you type from /api)
     terms = ['Spring', 'Summer', 'Fall']
 
     if request.method == 'POST':
@@ -247,12 +244,16 @@ def add_section():
                 'sec_year': int(sec_year)
             }
             insert_data('teaches', teaches_data)
+            # Show the new section on the instructor's dashboard
+            refreshed = refresh_now(refresh_sections, [(course_num, sec_num, sec_term, int(sec_year))])
 
             flash(
                 f'Section added: {course_num}-{sec_num} ({sec_term} {sec_year}), '
                 f'taught by {instructor_id}.',
                 'success'
             )
+            if not refreshed:
+                flash(LAG_MESSAGE, 'error')
             return redirect(url_for('data_entry.add_section'))
         
         except ValueError:
@@ -263,10 +264,10 @@ def add_section():
             )
             return render_template(
                 'data_entry/add_section.html',
-                courses=courses,
-                instructors=instructors,
                 terms=terms
             )
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             # Handles database insert failures
             flash(
@@ -277,15 +278,11 @@ def add_section():
             )
             return render_template(
                 'data_entry/add_section.html',
-                courses=courses,
-                instructors=instructors,
                 terms=terms
             )
     
     return render_template(
         'data_entry/add_section.html',
-        courses=courses,
-        instructors=instructors,
         terms=terms
     )
 
@@ -293,23 +290,7 @@ def add_section():
 @data_entry_bp.route('/associate_obj_course', methods=['GET', 'POST'])
 def link_course_objective():
     # Links a learning objective to a course within a specific degree
-    degrees = execute_query(
-        "SELECT degree_name, degree_level FROM degree ORDER BY degree_name"
-    )
-
-    # Only courses already associated with a degree are selectable
-    courses = execute_query("""
-        SELECT R.course_num, C.course_name 
-        FROM requires R
-        JOIN course C ON R.course_num = C.course_num
-        GROUP BY R.course_num, C.course_name 
-        ORDER BY R.course_num
-    """)
-
-    objectives = execute_query(
-        "SELECT obj_code, title FROM learning_objective ORDER BY obj_code"
-    )
-
+    # (options are loaded as you type; only degree-linked courses are offered)
     if request.method == 'POST':
         try:
             degree_name = request.form['degree_name']
@@ -323,12 +304,7 @@ def link_course_objective():
                     'Please pick a degree, a course, and a learning objective.',
                     'error'
                 )
-                return render_template(
-                    'data_entry/link_course_objective.html',
-                    degrees=degrees,
-                    courses=courses,
-                    objectives=objectives
-                )
+                return render_template('data_entry/link_course_objective.html')
 
             # Ensure the course is actually linked to the degree
             req_row = execute_query(
@@ -350,12 +326,7 @@ def link_course_objective():
                     'First use "Assign Course to Degree".',
                     'error'
                 )
-                return render_template(
-                    'data_entry/link_course_objective.html',
-                    degrees=degrees,
-                    courses=courses,
-                    objectives=objectives
-                )
+                return render_template('data_entry/link_course_objective.html')
 
             # Insert objective-course association
             data = {
@@ -365,14 +336,20 @@ def link_course_objective():
                 'obj_code': obj_code
             }
             insert_data('associated', data)
+            # One more objective owed for every section of this course
+            refreshed = refresh_now(refresh_course, course_num)
 
             flash(
                 f'Objective {obj_code} linked to course {course_num} '
                 f'for {degree_name} {degree_level}.',
                 'success'
             )
+            if not refreshed:
+                flash(LAG_MESSAGE, 'error')
             return redirect(url_for('data_entry.link_course_objective'))
         
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             # Handles duplicate links or database errors
             flash(
@@ -381,16 +358,56 @@ def link_course_objective():
                 f'Details: {e}',
                 'error'
             )
-            return render_template(
-                'data_entry/link_course_objective.html',
-                degrees=degrees,
-                courses=courses,
-                objectives=objectives
+            return render_template('data_entry/link_course_objective.html')
+
+    return render_template('data_entry/link_course_objective.html') 
+
+
+def split_codes(text):
+    # "CS101, CS102 CS103" -> ['CS101', 'CS102', 'CS103']
+    return [code for code in text.replace(',', ' ').split() if code]
+
+
+@data_entry_bp.route('/clone_degree', methods=['GET', 'POST'])
+def clone_degree():
+    # Copies a degree's course requirements and objective links to another
+    # degree in one transaction (optionally only some courses/objectives)
+    diff = None
+    if request.method == 'POST':
+        try:
+            source = request.form['source_degree'].split('|')
+            target = (request.form['target_name'].strip(), request.form['target_level'].strip())
+            if len(source) != 2 or not all(target):
+                flash('Please pick a source degree and enter the new degree name and level.', 'error')
+                return render_template('data_entry/clone_degree.html', diff=None)
+
+            dry_run = 'dry_run' in request.form
+            diff = clone_curriculum(
+                source,
+                target,
+                courses=split_codes(request.form.get('courses', '')),
+                objectives=split_codes(request.form.get('objectives', '')),
+                dry_run=dry_run
+            )
+            diff['dry_run'] = dry_run
+            diff['target'] = target
+            if not dry_run:
+                flash(
+                    f"Copied {len(diff['requires_new'])} course requirement(s) and "
+                    f"{len(diff['associated_new'])} objective link(s) to {target[0]} ({target[1]}).",
+                    'success'
+                )
+
+        except ValueError as e:
+            flash(str(e), 'error')
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            # Nothing is copied if any insert fails (single transaction)
+            flash(
+                'Database Error: Could not clone the degree. Nothing was copied. '
+                f'Details: {e}',
+                'error'
             )
 
-    return render_template(
-        'data_entry/link_course_objective.html',
-        degrees=degrees,
-        courses=courses,
-        objectives=objectives
-       ) 
\ No newline at end of file
+    return render_template('data_entry/clone_degree.html', diff=diff)
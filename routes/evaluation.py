@@ -1,55 +1,86 @@
+import io
 from flask import Blueprint, render_template, request, flash, redirect, url_for
-from database.handler import execute_query, get_db_connection_for_request
+from database.handler import execute_query, run_in_transaction, bump_tables, DatabaseUnavailable
+from database.dashboard import refresh_now, refresh_sections, LAG_MESSAGE
+from services.eval_import import import_evaluations, COLUMNS
 
 
 evaluation_bp = Blueprint('evaluation', __name__, url_prefix='/evaluation', template_folder='../templates')
 
+#degree value meaning "every degree at once" on the entry page
+ALL_DEGREES = 'ALL'
+
 #blueprint for eval routes
 @evaluation_bp.route('/', methods=['GET'])
 @evaluation_bp.route('/select', methods=['GET'])
 def select_evaluation():
     """Step 1: Let the instructor pick degree, instructor, and semester."""
-   #dropdowns for deg and instructor
-    try:
-        degrees = execute_query(
-            "SELECT degree_name, degree_level FROM degree ORDER BY degree_name"
-        )
-        instructors = execute_query(
-            "SELECT instructor_id, instructor_name FROM instructor ORDER BY instructor_name"
-        )
+    #deg and instructor options load as you type from /api
+    terms = ['Fall', 'Spring', 'Summer']
+
+    return render_template(
+        'evaluation/eval_select.html',
+        terms=terms
+    )
 
-        terms = ['Fall', 'Spring', 'Summer']
 
-        return render_template(
-            'evaluation/eval_select.html',
-            degrees=degrees,
-            instructors=instructors,
-            terms=terms
+
+@evaluation_bp.route('/dashboard', methods=['GET'])
+def instructor_dashboard():
+    """Every section an instructor taught, all terms and degrees, with what's still owed."""
+    instructor_id = request.args.get('instructor_id')
+    rows = None
+    if instructor_id:
+        #one primary-key range scan on the read model kept by database/dashboard.py
+        rows = execute_query(
+            """
+            SELECT sec_year, sec_term, course_num, sec_num, course_name, num_students,
+                   degree_name, degree_level, total_objs, entered_objs, improve_count
+            FROM instructor_dashboard
+            WHERE instructor_id = %s
+            ORDER BY sec_year DESC, sec_term, course_num, sec_num, degree_name, degree_level
+            """,
+            (instructor_id,),
+            row_mode='tuple'
         )
-    #catch errors
-    except Exception as e:
-        flash(f'Error loading dropdowns: {e}', 'error')
-        return redirect(url_for('index'))
 
+    owed = 0
+    if rows:
+        owed = sum(1 for row in rows if row.total_objs and row.entered_objs < row.total_objs)
+
+    return render_template(
+        'evaluation/dashboard.html',
+        instructor_id=instructor_id,
+        rows=rows,
+        owed=owed
+    )
 
 @evaluation_bp.route('/list_sections', methods=['GET'])
 def list_sections_status():
-    """Show all sections taught that semester and whether their objectives are entered."""
+    """
+    Show all sections taught that semester and whether their objectives are entered.
+    With no degree picked, every degree's objectives are shown together.
+    """
     #get params from form
-    degree_combined = request.args.get('degree')
+    degree_combined = request.args.get('degree') or ALL_DEGREES
     instructor_id = request.args.get('instructor_id')
     sec_term = request.args.get('sec_term')
     sec_year = request.args.get('sec_year')
 
-    if not all([degree_combined, instructor_id, sec_term, sec_year]):
+    if not all([instructor_id, sec_term, sec_year]):
         flash("Please fill out all fields first.", 'error')
         return redirect(url_for('evaluation.select_evaluation'))
-    #split degree into name and level
-    degree_name, degree_level = degree_combined.split('|')
-    #query sections taught by instructor that term
-    query_sections = """
+
+    all_degrees = degree_combined == ALL_DEGREES
+    degree_name, degree_level = (None, None) if all_degrees else degree_combined.split('|')
+    #every section, degree, objective and existing eval in one query
+    degree_filter = "" if all_degrees else "AND A.degree_name = %s AND A.degree_level = %s"
+    query = f"""
         SELECT S.sec_num, S.course_num, S.sec_term, S.sec_year,
-               C.course_name, S.num_students
+               C.course_name, S.num_students,
+               A.degree_name, A.degree_level, L.obj_code, L.title,
+               OE.based_on, OE.perform_a, OE.perform_b, OE.perform_c,
+               OE.perform_f, OE.improvements, OE.version
         FROM teaches T
         JOIN section S
           ON T.sec_num = S.sec_num
@@ -57,95 +88,80 @@ def list_sections_status():
          AND T.sec_term = S.sec_term
          AND T.sec_year = S.sec_year
         JOIN course C ON S.course_num = C.course_num
+        LEFT JOIN associated A
+          ON A.course_num = S.course_num
+         {degree_filter}
+        LEFT JOIN learning_objective L ON A.obj_code = L.obj_code
+        LEFT JOIN objective_eval OE
+          ON OE.sec_num = S.sec_num
+         AND OE.sec_term = S.sec_term
+         AND OE.sec_year = S.sec_year
+         AND OE.course_num = S.course_num
+         AND OE.obj_code = A.obj_code
+         AND OE.degree_name = A.degree_name
+         AND OE.degree_level = A.degree_level
         WHERE T.instructor_id = %s
           AND T.sec_term = %s
           AND T.sec_year = %s
+        ORDER BY S.course_num, S.sec_num, A.degree_name, A.degree_level, L.obj_code
     """
-
-    sections = execute_query(
-        query_sections,
-        (instructor_id, sec_term, sec_year)
-    )
+    params = (instructor_id, sec_term, sec_year)
+    if not all_degrees:
+        params = (degree_name, degree_level) + params
+    rows = execute_query(query, params)
 
     sections_data = []
+    by_section = {}
+    for row in rows:
+        section_key = (row['course_num'], row['sec_num'])
+        if section_key not in by_section:
+            section = {k: row[k] for k in ('sec_num', 'course_num', 'sec_term', 'sec_year', 'course_name', 'num_students')}
+            by_section[section_key] = {'section': section, 'degrees': {}}
+            sections_data.append(by_section[section_key])
+            #single-degree mode always shows the picked degree, even with no objectives
+            if not all_degrees:
+                by_section[section_key]['degrees'][(degree_name, degree_level)] = []
+        if row['obj_code'] is None:
+            continue
 
-    for section in sections:
-        course_num = section['course_num']
-        #find objs for course and degree
-        query_objs = """
-            SELECT L.obj_code, L.title
-            FROM associated A
-            JOIN learning_objective L ON A.obj_code = L.obj_code
-            WHERE A.degree_name = %s
-              AND A.degree_level = %s
-              AND A.course_num = %s
-        """
-        objectives = execute_query(query_objs, (degree_name, degree_level, course_num))
-
-        eval_count = 0
-        #check eval status for objs
-        for obj in objectives:
-            check_query = """
-                SELECT
-                    based_on,
-                    perform_a,
-                    perform_b,
-                    perform_c,
-                    perform_f,
-                    improvements
-                FROM objective_eval
-                WHERE sec_num=%s AND sec_term=%s AND sec_year=%s
-                AND obj_code=%s
-                AND degree_name=%s AND degree_level=%s
-                AND course_num=%s
-            """
-
-            eval_row = execute_query(
-                check_query,
-                (
-                    section['sec_num'], sec_term, sec_year,
-                    obj['obj_code'], degree_name, degree_level, course_num
-                ),
-                fetch_one=True
-            )
-            #obj is entered if eval row exists
-            if eval_row:
-                    obj['status'] = 'Entered'
-                    obj['improvement_entered'] = bool(eval_row.get('improvements'))
-                    obj['based_on'] = eval_row['based_on']
-                    obj['perform_a'] = eval_row['perform_a']
-                    obj['perform_b'] = eval_row['perform_b']
-                    obj['perform_c'] = eval_row['perform_c']
-                    obj['perform_f'] = eval_row['perform_f']
-                    obj['improvements'] = eval_row['improvements']
-
-                    eval_count += 1
-            else:
-                    obj['status'] = 'Missing'
-                    obj['improvement_entered'] = False
-
-
-
-        total = len(objectives)
-        if total == 0:
-            status = "Not Entered"
-        elif eval_count == total:
-            status = "Fully Entered"
-        elif eval_count > 0:
-            status = f"Partially Entered ({eval_count}/{total})"
+        obj = {'obj_code': row['obj_code'], 'title': row['title']}
+        #obj is entered if eval row exists
+        if row['version'] is not None:
+            obj['status'] = 'Entered'
+            obj['improvement_entered'] = bool(row['improvements'])
+            for field in ('based_on', 'perform_a', 'perform_b', 'perform_c', 'perform_f', 'improvements', 'version'):
+                obj[field] = row[field]
         else:
-            status = "Not Entered"
+            obj['status'] = 'Missing'
+            obj['improvement_entered'] = False
+        by_section[section_key]['degrees'].setdefault((row['degree_name'], row['degree_level']), []).append(obj)
 
-        sections_data.append({
-            'section': section,
-            'objectives': objectives,
-            'status': status
-        })
+    for item in sections_data:
+        degrees = []
+        for (name, level), objectives in item.pop('degrees').items():
+            total = len(objectives)
+            eval_count = sum(1 for obj in objectives if obj['status'] == 'Entered')
+            if total == 0:
+                status = "Not Entered"
+            elif eval_count == total:
+                status = "Fully Entered"
+            elif eval_count > 0:
+                status = f"Partially Entered ({eval_count}/{total})"
+            else:
+                status = "Not Entered"
+            degrees.append({
+                'degree_name': name,
+                'degree_level': level,
+                'objectives': objectives,
+                'status': status
+            })
+        item['degrees'] = degrees
     #render pg
     return render_template(
         'evaluation/eval_entry.html',
         sections_data=sections_data,
         context={
+            'all_degrees': all_degrees,
             'degree_name': degree_name,
             'degree_level': degree_level,
             'instructor_id': instructor_id,
@@ -155,128 +171,211 @@ def list_sections_status():
     )
 
 
+class EvaluationLimitError(Exception):
+    """A section's A/B/C/F counts don't add up to its class size."""
+
+
+def parse_evaluation_form(form):
+    """Collect one entry per objective from the big form (keys look like course|sec|degree|level|obj|field)."""
+    entries = []
+    for key, value in form.items():
+        if "|" in key and key.endswith("|based_on"):
+            course_num, sec_num, degree_name, degree_level, obj_code, _ = key.split("|")
+            prefix = key[:-len("based_on")]
+            entries.append({
+                'course_num': course_num,
+                'sec_num': sec_num,
+                'degree_name': degree_name,
+                'degree_level': degree_level,
+                'obj_code': obj_code,
+                'based_on': value,
+                'perform_a': int(form.get(prefix + 'perform_a') or 0),
+                'perform_b': int(form.get(prefix + 'perform_b') or 0),
+                'perform_c': int(form.get(prefix + 'perform_c') or 0),
+                'perform_f': int(form.get(prefix + 'perform_f') or 0),
+                'improvements': form.get(prefix + 'improvements'),
+                #version the form was loaded with; blank means the row didn't exist yet
+                'version': int(form[prefix + 'version']) if form.get(prefix + 'version') else None,
+                'duplicate': form.get(prefix + 'duplicate') == 'on'
+            })
+    #same lock order in every transaction, so concurrent saves queue instead of deadlocking
+    entries.sort(key=lambda e: (e['course_num'], e['sec_num'], e['degree_name'], e['degree_level'], e['obj_code']))
+    return entries
+
+
+def _row_in(columns, count):
+    """'(a, b) IN ((%s, %s), ...)' for count keys."""
+    one = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    return f"({', '.join(columns)}) IN ({', '.join([one] * count)})"
+
+
 @evaluation_bp.route('/save', methods=['POST'])
 def save_evaluation():
-    """Save all evaluation data entered on the big form."""
-    #helper to check if eval row exists
-    def check_exists(cursor, pk_params):
-        """Check whether this objective_eval row already exists."""
-        check_query = """
-            SELECT 1 FROM objective_eval
-            WHERE sec_num=%s AND sec_term=%s AND sec_year=%s
-              AND obj_code=%s
-              AND degree_name=%s AND degree_level=%s
-              AND course_num=%s
-        """
-        cursor.execute(check_query, pk_params)
-        return cursor.fetchone()
-    
-    conn = get_db_connection_for_request()
-    cursor = conn.cursor()
+    """Save all evaluation data entered on the big form (one or every degree) in one transaction."""
     #context 
     degree_name_context = request.form.get('degree_name')
     degree_level_context = request.form.get('degree_level')
     sec_term_context = request.form.get('sec_term')
     sec_year_context = request.form.get('sec_year')
 
-    saved_count = 0
-    #process each objective eval entry
-    try:
-        for key, value in request.form.items():
-            if "|" in key and key.endswith("|based_on"):
-                course_num, sec_num, obj_code, _ = key.split("|")
-                prefix = f"{course_num}|{sec_num}|{obj_code}|"
-
-                based_on = value
-                perform_a = int(request.form.get(prefix + 'perform_a') or 0)
-                perform_b = int(request.form.get(prefix + 'perform_b') or 0)
-                perform_c = int(request.form.get(prefix + 'perform_c') or 0)
-                perform_f = int(request.form.get(prefix + 'perform_f') or 0)
-                improvements = request.form.get(prefix + 'improvements')
-                
-               #make sure not too many
-                total_entered = perform_a + perform_b + perform_c + perform_f
+    #edit: only applies if nobody saved the row since the form was loaded (0 rows = conflict)
+    update_sql = """
+        UPDATE objective_eval
+        SET based_on=%s, perform_a=%s, perform_b=%s,
+            perform_c=%s, perform_f=%s, improvements=%s,
+            version = version + 1
+        WHERE sec_num=%s AND sec_term=%s AND sec_year=%s
+          AND obj_code=%s AND degree_name=%s AND degree_level=%s
+          AND course_num=%s
+          AND version=%s
+    """
+    #new row: if someone else created it first, the no-op update leaves theirs (0 rows = conflict)
+    insert_sql = """
+        INSERT INTO objective_eval
+          (based_on, perform_a, perform_b, perform_c, perform_f, improvements,
+           sec_num, sec_term, sec_year,
+           obj_code, degree_name, degree_level, course_num)
+        VALUES (%s, %s, %s, %s, %s, %s,
+                %s, %s, %s,
+                %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE based_on = objective_eval.based_on
+    """
+    #copy to every other degree linking this course/objective, keeping rows already there
+    duplicate_sql = """
+        INSERT INTO objective_eval
+          (based_on, perform_a, perform_b, perform_c, perform_f, improvements,
+           sec_num, sec_term, sec_year,
+           obj_code, degree_name, degree_level, course_num)
+        SELECT %s, %s, %s, %s, %s, %s,
+               %s, %s, %s,
+               A.obj_code, A.degree_name, A.degree_level, A.course_num
+        FROM associated A
+        WHERE A.course_num=%s AND A.obj_code=%s
+          AND NOT (A.degree_name=%s AND A.degree_level=%s)
+        ORDER BY A.degree_name, A.degree_level
+        ON DUPLICATE KEY UPDATE based_on = objective_eval.based_on
+    """
 
-                cursor.execute(
-                    "SELECT num_students FROM section WHERE course_num=%s AND sec_num=%s AND sec_term=%s AND sec_year=%s",
-                    (course_num, sec_num, sec_term_context, sec_year_context)
+    def save(cursor):
+        #reset on every attempt, in case run_in_transaction retries
+        del conflicts[:]
+        if not entries:
+            return 0
+
+        #make sure not too many: every class size in one query
+        cursor.execute(
+            "SELECT course_num, sec_num, num_students FROM section "
+            "WHERE sec_term=%s AND sec_year=%s AND " + _row_in(('course_num', 'sec_num'), len(sections)),
+            (sec_term_context, sec_year_context) + tuple(v for key in sections for v in key)
+        )
+        class_sizes = {(course_num, sec_num): size for course_num, sec_num, size in cursor.fetchall()}
+        for entry in entries:
+            max_students = class_sizes.get((entry['course_num'], entry['sec_num']))
+            total_entered = (
+                entry['perform_a'] + entry['perform_b'] + entry['perform_c'] + entry['perform_f']
+            )
+            if max_students is not None and total_entered != max_students:
+                raise EvaluationLimitError(
+                    f"Error: You entered {total_entered} grades for Course {entry['course_num']} "
+                    f"(Section {entry['sec_num']}), but the class limit is {max_students}."
                 )
-                student_limit_row = cursor.fetchone()
-                
-                if student_limit_row:
-                    max_students = student_limit_row[0]
-                    
-                    if total_entered != max_students:
-                        flash(f"Error: You entered {total_entered} grades for Course {course_num} (Section {sec_num}), but the class limit is {max_students}.", "error")
-                        return redirect(url_for('evaluation.select_evaluation'))
-
-                eval_params = (
-                    based_on, perform_a, perform_b, perform_c, perform_f, improvements,
-                    sec_num, sec_term_context, sec_year_context,
-                    obj_code, degree_name_context, degree_level_context, course_num
+
+        #no locking read first: each write checks the version itself, so only the
+        #rows actually written are locked, and no gaps
+        saved_count = 0
+        for entry in entries:
+            values = (
+                entry['based_on'], entry['perform_a'], entry['perform_b'],
+                entry['perform_c'], entry['perform_f'], entry['improvements'],
+                entry['sec_num'], sec_term_context, sec_year_context
+            )
+            pk = (entry['obj_code'], entry['degree_name'], entry['degree_level'], entry['course_num'])
+            if entry['version'] is None:
+                cursor.execute(insert_sql, values + pk)
+            else:
+                cursor.execute(update_sql, values + pk + (entry['version'],))
+            #someone else saved this objective after the form was loaded: report it, don't overwrite
+            if cursor.rowcount != 1:
+                conflicts.append(f"{entry['course_num']}-{entry['sec_num']} {entry['degree_name']} {entry['obj_code']}")
+                continue
+            saved_count += 1
+            #duplicates
+            if entry['duplicate']:
+                cursor.execute(
+                    duplicate_sql,
+                    values + (entry['course_num'], entry['obj_code'], entry['degree_name'], entry['degree_level'])
                 )
+                #1 per inserted row, 0 for rows left alone
+                saved_count += cursor.rowcount
+        return saved_count
 
-                #primary key fields
-                pk_params = eval_params[6:]  
-                
-                exists = check_exists(cursor, pk_params)
-                #update or insert
-                if exists:
-                    update_sql = """
-                        UPDATE objective_eval
-                        SET based_on=%s, perform_a=%s, perform_b=%s,
-                            perform_c=%s, perform_f=%s, improvements=%s
-                        WHERE sec_num=%s AND sec_term=%s AND sec_year=%s
-                          AND obj_code=%s AND degree_name=%s AND degree_level=%s
-                          AND course_num=%s
-                    """
-                    cursor.execute(update_sql, eval_params)
-                else:
-                    insert_sql = """
-                        INSERT INTO objective_eval
-                          (based_on, perform_a, perform_b, perform_c, perform_f, improvements,
-                           sec_num, sec_term, sec_year,
-                           obj_code, degree_name, degree_level, course_num)
-                        VALUES (%s, %s, %s, %s, %s, %s,
-                                %s, %s, %s,
-                                %s, %s, %s, %s)
-                    """
-                    cursor.execute(insert_sql, eval_params)
-
-                saved_count += 1
-                #duplicates
-                duplicate_key = f"{prefix}duplicate"
-                if request.form.get(duplicate_key) == 'on':
-                    query_other = """
-                        SELECT DISTINCT degree_name, degree_level
-                        FROM associated
-                        WHERE course_num=%s AND obj_code=%s
-                        AND NOT (degree_name=%s AND degree_level=%s)
-                    """
-                    cursor.execute(
-                        query_other,
-                        (course_num, obj_code, degree_name_context, degree_level_context)
-                    )
-
-                    for dn, dl in cursor.fetchall():
-                        dup_params = (
-                            based_on, perform_a, perform_b, perform_c, perform_f, improvements,
-                            sec_num, sec_term_context, sec_year_context,
-                            obj_code, dn, dl, course_num
-                        )
-                        dup_pk = dup_params[6:]
-
-                        if not check_exists(cursor, dup_pk):
-                            cursor.execute(insert_sql, dup_params)
-                            saved_count += 1
-
-        conn.commit()
+    conflicts = []
+    #process each objective eval entry
+    try:
+        entries = parse_evaluation_form(request.form)
+        sections = sorted({(e['course_num'], e['sec_num']) for e in entries})
+        saved_count = run_in_transaction(save)
+        bump_tables('objective_eval')
+        #the dashboard rebuild gets its own short transaction, after the save has committed
+        refreshed = not saved_count or refresh_now(refresh_sections, [
+            (course_num, sec_num, sec_term_context, int(sec_year_context))
+            for course_num, sec_num in sections
+        ])
         flash(f"Saved {saved_count} evaluation record(s).", "success")
+        if not refreshed:
+            flash(LAG_MESSAGE, "error")
+        if conflicts:
+            flash(
+                "Not saved because someone else changed them after you opened the form: "
+                + ", ".join(conflicts)
+                + ". Their latest values are shown below; re-enter your changes if still needed.",
+                "error"
+            )
+            #back to the same list so the latest values are on screen
+            return redirect(url_for(
+                'evaluation.list_sections_status',
+                degree=f"{degree_name_context}|{degree_level_context}" if degree_name_context else ALL_DEGREES,
+                instructor_id=request.form.get('instructor_id'),
+                sec_term=sec_term_context,
+                sec_year=sec_year_context
+            ))
         return redirect(url_for('evaluation.select_evaluation'))
 
+    except EvaluationLimitError as e:
+        flash(str(e), "error")
+        return redirect(url_for('evaluation.select_evaluation'))
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
-        conn.rollback()
         flash(f"Error saving evaluations: {e}", "error")
         return redirect(url_for('evaluation.select_evaluation'))
-    finally:
-        cursor.close()
+
+
+@evaluation_bp.route('/import', methods=['GET', 'POST'])
+def import_evaluation_csv():
+    """Upload a spreadsheet export (CSV) of evaluation results instead of typing them in."""
+    result = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash("Please choose a CSV file to upload.", "error")
+            return redirect(url_for('evaluation.import_evaluation_csv'))
+        #read the upload as text line by line instead of loading it whole
+        lines = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            result = import_evaluations(lines, dry_run='dry_run' in request.form)
+        except UnicodeDecodeError:
+            flash("The file isn't UTF-8 text. Save the spreadsheet as CSV (UTF-8) and try again.", "error")
+            return redirect(url_for('evaluation.import_evaluation_csv'))
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            flash(f"Error importing evaluations: {e}", "error")
+            return redirect(url_for('evaluation.import_evaluation_csv'))
+        result['dry_run'] = 'dry_run' in request.form
+
+    return render_template(
+        'evaluation/import.html',
+        columns=COLUMNS,
+        result=result
+    )
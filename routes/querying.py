@@ -1,9 +1,28 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from database.handler import execute_query
+import csv
+import io
+from flask import (
+    Blueprint, render_template, stream_template, request, flash, redirect, url_for, jsonify, Response,
+    get_flashed_messages
+)
+from database.handler import execute_query, iter_query, escape_like, DatabaseUnavailable
+from services.jobs import submit_job, get_job_runner
+from services.coverage import get_coverage_matrix
+from database.archive import year_source
 #blueprint for query and reporting pages
 querying_bp = Blueprint('querying', __name__, url_prefix='/query', template_folder='../templates')
 
 
+def stream_page(template, **context):
+    """
+    stream_template, with this request's flashes taken out of the session
+    first: by the time layout.html asks for them the session cookie has
+    already been sent, so they would show again on the next page.
+    """
+    #cached on the request context, where layout.html's call finds them
+    get_flashed_messages(with_categories=True)
+    return stream_template(template, **context)
+
+
 @querying_bp.route('/')
 def query_menu():
     """Show the main menu for all query/report options."""
@@ -18,10 +37,6 @@ def query_degree_details():
       - list all learning objectives
       - show which courses are linked to which objectives
     """
-    #deg dropdown options
-    degrees = execute_query(
-        "SELECT degree_name, degree_level FROM degree ORDER BY degree_name"
-    )
     results = None
 
     if request.method == 'POST':
@@ -38,7 +53,6 @@ def query_degree_details():
                   AND R.degree_level = %s
                 ORDER BY R.core DESC, R.course_num
             """
-            courses = execute_query(courses_query, (degree_name, degree_level))
             #objectives linked to deg
             objectives_query = """
                 SELECT L.obj_code, L.title, L.description
@@ -49,7 +63,6 @@ def query_degree_details():
                 GROUP BY L.obj_code, L.title, L.description
                 ORDER BY L.obj_code
             """
-            objectives = execute_query(objectives_query, (degree_name, degree_level))
             #objective to course links for deg
             associated_query = """
                 SELECT A.obj_code, A.course_num
@@ -57,7 +70,14 @@ def query_degree_details():
                 WHERE A.degree_name = %s
                   AND A.degree_level = %s
             """
-            associated_links = execute_query(associated_query, (degree_name, degree_level))
+            #independent queries: run together (concurrently when [async] is on);
+            #imported here so asyncio only loads once a report needs it
+            from database.async_handler import run_queries
+            courses, objectives, associated_links = run_queries([
+                (courses_query, (degree_name, degree_level)),
+                (objectives_query, (degree_name, degree_level)),
+                (associated_query, (degree_name, degree_level))
+            ])
 
             results = {
                 'degree_name': degree_name,
@@ -67,10 +87,12 @@ def query_degree_details():
                 'associated_links': associated_links
             }
 
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             flash(f'Error running degree query. Details: {e}', 'error')
 
-    return render_template('querying/degree_details.html', degrees=degrees, results=results)
+    return render_template('querying/degree_details.html', results=results)
 
 
 @querying_bp.route('/degree_sections', methods=['GET', 'POST'])
@@ -80,10 +102,6 @@ def query_degree_sections():
       - list all sections of courses required by that degree,
         ordered by year and term. [cite: 60]
     """
-    #deg dropdown options
-    degrees = execute_query(
-        "SELECT degree_name, degree_level FROM degree ORDER BY degree_name"
-    )
     sections = None
 
     if request.method == 'POST':
@@ -94,10 +112,10 @@ def query_degree_sections():
             start_year = request.form['start_year']
             end_year = request.form['end_year']
             #query sections for deg in year range
-            sections_query = """
+            sections_query = f"""
                 SELECT S.course_num, C.course_name, S.sec_num,
                        S.sec_term, S.sec_year, R.core
-                FROM section S
+                FROM {year_source('section', start_year)} S
                 JOIN course C ON S.course_num = C.course_num
                 JOIN requires R
                   ON S.course_num = R.course_num
@@ -109,15 +127,17 @@ def query_degree_sections():
                     FIELD(S.sec_term, 'Spring', 'Summer', 'Fall'),
                     S.course_num
             """
-            sections = execute_query(
+            sections = iter_query(
                 sections_query,
                 (degree_name, degree_level, start_year, end_year)
             )
 
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             flash(f'Error querying degree sections. Details: {e}', 'error')
 
-    return render_template('querying/degree_sections.html', degrees=degrees, sections=sections)
+    return stream_page('querying/degree_sections.html', sections=sections)
 
 
 @querying_bp.route('/course_sections', methods=['GET', 'POST'])
@@ -126,10 +146,6 @@ def query_course_sections():
     For a chosen course and year range:
       - list all sections of that course, with instructor and enrollment. [cite: 65]
     """
-    #course dropdown options
-    courses = execute_query(
-        "SELECT course_num, course_name FROM course ORDER BY course_num"
-    )
     sections = None
 
     if request.method == 'POST':
@@ -139,11 +155,11 @@ def query_course_sections():
             start_year = request.form['start_year']
             end_year = request.form['end_year']
             #query sections for course
-            sections_query = """
+            sections_query = f"""
                 SELECT S.sec_num, S.sec_term, S.sec_year,
                        S.num_students, I.instructor_name
-                FROM section S
-                LEFT JOIN teaches T
+                FROM {year_source('section', start_year)} S
+                LEFT JOIN {year_source('teaches', start_year)} T
                   ON S.sec_num = T.sec_num
                  AND S.course_num = T.course_num
                  AND S.sec_term = T.sec_term
@@ -156,15 +172,17 @@ def query_course_sections():
                     S.sec_year,
                     FIELD(S.sec_term, 'Spring', 'Summer', 'Fall')
             """
-            sections = execute_query(
+            sections = iter_query(
                 sections_query,
                 (course_num, start_year, end_year)
             )
 
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             flash(f'Error querying course sections. Details: {e}', 'error')
 
-    return render_template('querying/course_sections.html', courses=courses, sections=sections)
+    return stream_page('querying/course_sections.html', sections=sections)
 
 
 @querying_bp.route('/instructor_sections', methods=['GET', 'POST'])
@@ -173,10 +191,6 @@ def query_instructor_sections():
     For a chosen instructor and year range:
       - list all sections they have taught. [cite: 68]
     """
-    #instructor dropdown options
-    instructors = execute_query(
-        "SELECT instructor_id, instructor_name FROM instructor ORDER BY instructor_name"
-    )
     sections = None
 
     if request.method == 'POST':
@@ -186,11 +200,11 @@ def query_instructor_sections():
             start_year = request.form['start_year']
             end_year = request.form['end_year']
             #query sections for instructor
-            sections_query = """
+            sections_query = f"""
                 SELECT T.course_num, C.course_name,
                        T.sec_num, T.sec_term, T.sec_year
-                FROM teaches T
-                JOIN section S
+                FROM {year_source('teaches', start_year)} T
+                JOIN {year_source('section', start_year)} S
                   ON T.sec_num = S.sec_num
                  AND T.course_num = S.course_num
                  AND T.sec_term = S.sec_term
@@ -203,21 +217,131 @@ def query_instructor_sections():
                     T.sec_year,
                     FIELD(T.sec_term, 'Spring', 'Summer', 'Fall')
             """
-            sections = execute_query(
+            sections = iter_query(
                 sections_query,
                 (instructor_id, start_year, end_year)
             )
 
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             flash(f'Error querying instructor sections. Details: {e}', 'error')
 
-    return render_template(
+    return stream_page(
         'querying/instructor_sections.html',
-        instructors=instructors,
         sections=sections
     )
 
 
+def build_evaluation_status(sec_term, sec_year):
+    """Per-section, per-degree evaluation status for one semester (runs as a background job)."""
+    #query sections for term and yr
+    sections_query = f"""
+        SELECT
+            S.course_num, S.sec_num, S.sec_term, S.sec_year,
+            C.course_name, S.num_students,
+            I.instructor_name
+        FROM {year_source('section', sec_year)} S
+        JOIN course C ON S.course_num = C.course_num
+        LEFT JOIN {year_source('teaches', sec_year)} T
+          ON S.sec_num = T.sec_num
+         AND S.course_num = T.course_num
+         AND S.sec_term = T.sec_term
+         AND S.sec_year = T.sec_year
+        LEFT JOIN instructor I
+          ON T.instructor_id = I.instructor_id
+        WHERE S.sec_term = %s
+          AND S.sec_year = %s
+        ORDER BY S.course_num, S.sec_num
+    """
+    sections = execute_query(sections_query, (sec_term, sec_year))
+
+    #query total expected evals for core objectives
+    total_expected_evals_query = """
+        SELECT
+            R.degree_name,
+            R.degree_level,
+            COUNT(A.obj_code) AS total_objs
+        FROM requires R
+        LEFT JOIN associated A
+          ON R.course_num   = A.course_num
+         AND R.degree_name = A.degree_name
+         AND R.degree_level= A.degree_level
+        WHERE R.course_num = %s
+          AND R.core = TRUE
+        GROUP BY R.degree_name, R.degree_level
+    """
+    #query entered evals for a course and deg
+    entered_evals_query = f"""
+        SELECT
+            COUNT(*) AS entered_count,
+            SUM(
+                CASE
+                  WHEN improvements IS NOT NULL
+                       AND improvements != ''
+                  THEN 1 ELSE 0
+                END
+            ) AS improve_count
+        FROM {year_source('objective_eval', sec_year)} OE
+        WHERE sec_term   = %s
+          AND sec_year   = %s
+          AND course_num = %s
+          AND degree_name  = %s
+          AND degree_level = %s
+    """
+
+    #one lookup per distinct course / (course, degree), each batch sent together
+    #(concurrently on the async pool when [async] is on)
+    from database.async_handler import run_queries
+    courses = sorted({section['course_num'] for section in sections})
+    expected_by_course = dict(zip(courses, run_queries(
+        (total_expected_evals_query, (course_num,)) for course_num in courses
+    )))
+    pairs = [
+        (course_num, expected['degree_name'], expected['degree_level'])
+        for course_num in courses
+        for expected in expected_by_course[course_num]
+    ]
+    entered_by_pair = dict(zip(pairs, run_queries(
+        (entered_evals_query, (sec_term, sec_year) + pair) for pair in pairs
+    )))
+
+    results = []
+
+    for section in sections:
+        course_num = section['course_num']
+        section_data = dict(section)
+        section_data['evaluations'] = []
+
+        for expected in expected_by_course[course_num]:
+            degree_name = expected['degree_name']
+            degree_level = expected['degree_level']
+            total_objs = expected['total_objs']
+            eval_counts = entered_by_pair[(course_num, degree_name, degree_level)][0]
+
+            entered_count = eval_counts['entered_count']
+            improve_count = eval_counts['improve_count'] or 0
+            #status label
+            status = 'Not Entered'
+            if total_objs > 0:
+                if entered_count == total_objs:
+                    status = 'Fully Entered'
+                elif entered_count > 0:
+                    status = f'Partially Entered ({entered_count}/{total_objs})'
+            elif entered_count > 0:
+                status = 'Data Exists (No Objectives Set)'
+
+            section_data['evaluations'].append({
+                'degree': f"{degree_name} ({degree_level})",
+                'status': status,
+                'improvement_paragraph': 'Entered' if improve_count > 0 else 'Missing'
+            })
+
+        results.append(section_data)
+
+    return results
+
+
 @querying_bp.route('/evaluation_status', methods=['GET', 'POST'])
 def query_evaluation_status():
     """
@@ -226,121 +350,54 @@ def query_evaluation_status():
         * how many objectives should be evaluated
         * how many have eval rows
         * whether the status is Full / Partial / Not Entered. [cite: 70]
+    The report runs as a background job; the page polls until it is done.
     """
     results = None
+    job = None
     terms = ['Spring', 'Summer', 'Fall']
+    selected = {}
 
     if request.method == 'POST':
-        try:
-            #read term and yr from form
-            sec_term = request.form['sec_term']
-            sec_year = request.form['sec_year']
-            #query sections for term and yr
-            sections_query = """
-                SELECT
-                    S.course_num, S.sec_num, S.sec_term, S.sec_year,
-                    C.course_name, S.num_students,
-                    I.instructor_name
-                FROM section S
-                JOIN course C ON S.course_num = C.course_num
-                LEFT JOIN teaches T
-                  ON S.sec_num = T.sec_num
-                 AND S.course_num = T.course_num
-                 AND S.sec_term = T.sec_term
-                 AND S.sec_year = T.sec_year
-                LEFT JOIN instructor I
-                  ON T.instructor_id = I.instructor_id
-                WHERE S.sec_term = %s
-                  AND S.sec_year = %s
-                ORDER BY S.course_num, S.sec_num
-            """
-            sections = execute_query(sections_query, (sec_term, sec_year))
-
-            results = []
-
-            for section in sections:
-                course_num = section['course_num']
-            #query total expected evals for core objectives
-                total_expected_evals_query = """
-                    SELECT
-                        R.degree_name,
-                        R.degree_level,
-                        COUNT(A.obj_code) AS total_objs
-                    FROM requires R
-                    LEFT JOIN associated A
-                      ON R.course_num   = A.course_num
-                     AND R.degree_name = A.degree_name
-                     AND R.degree_level= A.degree_level
-                    WHERE R.course_num = %s
-                      AND R.core = TRUE
-                    GROUP BY R.degree_name, R.degree_level
-                """
-                expected_evals = execute_query(
-                    total_expected_evals_query,
-                    (course_num,)
-                )
-
-                section_data = dict(section)
-                section_data['evaluations'] = []
-
-                for expected in expected_evals:
-                    degree_name = expected['degree_name']
-                    degree_level = expected['degree_level']
-                    total_objs = expected['total_objs']
-                    #query entered evals for this section and deg
-                    entered_evals_query = """
-                        SELECT
-                            COUNT(*) AS entered_count,
-                            SUM(
-                                CASE
-                                  WHEN improvements IS NOT NULL
-                                       AND improvements != ''
-                                  THEN 1 ELSE 0
-                                END
-                            ) AS improve_count
-                        FROM objective_eval
-                        WHERE sec_term   = %s
-                          AND sec_year   = %s
-                          AND course_num = %s
-                          AND degree_name  = %s
-                          AND degree_level = %s
-                    """
-                    eval_counts = execute_query(
-                        entered_evals_query,
-                        (sec_term, sec_year, course_num, degree_name, degree_level),
-                        fetch_one=True
-                    )
-
-                    entered_count = eval_counts['entered_count']
-                    improve_count = eval_counts['improve_count']
-                    #status label
-                    status = 'Not Entered'
-                    if total_objs > 0:
-                        if entered_count == total_objs:
-                            status = 'Fully Entered'
-                        elif entered_count > 0:
-                            status = f'Partially Entered ({entered_count}/{total_objs})'
-                    elif entered_count > 0:
-                        status = 'Data Exists (No Objectives Set)'
-
-                    section_data['evaluations'].append({
-                        'degree': f"{degree_name} ({degree_level})",
-                        'status': status,
-                        'improvement_paragraph': 'Entered' if improve_count > 0 else 'Missing'
-                    })
-
-                results.append(section_data)
-
-        except Exception as e:
-            flash(f'Error running evaluation status query. Details: {e}', 'error')
-
+        #read term and yr from form, then hand the report to the job runner
+        job = submit_job(
+            'evaluation_status',
+            build_evaluation_status,
+            sec_term=request.form['sec_term'],
+            sec_year=request.form['sec_year']
+        )
+        return redirect(url_for('querying.query_evaluation_status', job=job.id))
+
+    job_id = request.args.get('job')
+    if job_id:
+        job = get_job_runner().get(job_id)
+        if job is None:
+            flash('That report has expired. Please run it again.', 'error')
+        else:
+            selected = job.params
+            if job.status == 'done':
+                results = job.result
+            elif job.status == 'failed':
+                flash(f'Error running evaluation status query. Details: {job.error}', 'error')
+
+    #the job's rows are already in memory, so there is nothing to gain from streaming
     return render_template(
         'querying/evaluation_status.html',
         results=results,
+        job=job,
+        selected=selected,
         terms=terms
     )
 
 
+@querying_bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    """JSON status of a background report job, for polling."""
+    job = get_job_runner().get(job_id)
+    if job is None:
+        return jsonify({'id': job_id, 'status': 'expired'}), 404
+    return jsonify(job.to_dict())
+
+
 @querying_bp.route('/grade_percentage', methods=['GET', 'POST'])
 def query_grade_percentage():
     """
@@ -358,7 +415,7 @@ def query_grade_percentage():
             sec_year = request.form['sec_year']
             percentage = float(request.form['percentage']) / 100.0
             #query objective evals meeting threshold
-            grade_query = """
+            grade_query = f"""
                 SELECT
                     OE.course_num,
                     OE.sec_num,
@@ -373,8 +430,8 @@ def query_grade_percentage():
                     OE.based_on,
                     (OE.perform_a + OE.perform_b + OE.perform_c) AS total_non_f,
                     (OE.perform_a + OE.perform_b + OE.perform_c + OE.perform_f) AS total_grades_entered
-                FROM objective_eval OE
-                JOIN section S
+                FROM {year_source('objective_eval', sec_year)} OE
+                JOIN {year_source('section', sec_year)} S
                 ON OE.course_num = S.course_num
                 AND OE.sec_num   = S.sec_num
                 AND OE.sec_term  = S.sec_term
@@ -393,11 +450,14 @@ def query_grade_percentage():
             """
             sections = execute_query(
                 grade_query,
-                (sec_term, sec_year, percentage)
+                (sec_term, sec_year, percentage),
+                row_mode='tuple'
             )
 
         except ValueError:
             flash('Error: Percentage must be a valid number.', 'error')
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             flash(f'Error running grade percentage query. Details: {e}', 'error')
 
@@ -406,3 +466,141 @@ def query_grade_percentage():
         sections=sections,
         terms=terms
     )
+
+
+SEARCH_PAGE_SIZE = 20
+
+
+@querying_bp.route('/search', methods=['GET'])
+def search():
+    """
+    Ranked full-text search over learning objectives and courses.
+    Uses the FULLTEXT indexes from migrations/001_fulltext_search.sql.
+    """
+    q = (request.args.get('q') or '').strip()
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    results = None
+    total = 0
+
+    if q:
+        try:
+            prefix = escape_like(q) + '%'
+            #objectives by relevance, courses by relevance plus exact course number hits.
+            #FULLTEXT and prefix matches are separate UNION branches: an OR between
+            #MATCH and LIKE stops MySQL from using either index
+            search_query = """
+                SELECT kind, code, MAX(title) AS title, MAX(detail) AS detail, SUM(score) AS score
+                FROM (
+                    SELECT 'objective' AS kind, L.obj_code AS code, L.title AS title,
+                           L.description AS detail,
+                           MATCH(L.title, L.description) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+                    FROM learning_objective L
+                    WHERE MATCH(L.title, L.description) AGAINST (%s IN NATURAL LANGUAGE MODE)
+                    UNION ALL
+                    SELECT 'objective', L.obj_code, L.title, L.description, 0
+                    FROM learning_objective L
+                    WHERE L.obj_code LIKE %s
+                    UNION ALL
+                    SELECT 'course', C.course_num, C.course_name, NULL,
+                           MATCH(C.course_name) AGAINST (%s IN NATURAL LANGUAGE MODE)
+                    FROM course C
+                    WHERE MATCH(C.course_name) AGAINST (%s IN NATURAL LANGUAGE MODE)
+                    UNION ALL
+                    SELECT 'course', C.course_num, C.course_name, NULL, 10
+                    FROM course C
+                    WHERE C.course_num LIKE %s
+                ) hits
+                GROUP BY kind, code
+                ORDER BY score DESC, code
+                LIMIT %s OFFSET %s
+            """
+            results = execute_query(
+                search_query,
+                (q, q, prefix, q, q, prefix,
+                 SEARCH_PAGE_SIZE, (page - 1) * SEARCH_PAGE_SIZE)
+            )
+            #total hit count for the pager (UNION drops rows matched by both branches)
+            count_query = """
+                SELECT
+                  (SELECT COUNT(*) FROM (
+                       SELECT obj_code FROM learning_objective
+                       WHERE MATCH(title, description) AGAINST (%s IN NATURAL LANGUAGE MODE)
+                       UNION
+                       SELECT obj_code FROM learning_objective WHERE obj_code LIKE %s
+                   ) O)
+                + (SELECT COUNT(*) FROM (
+                       SELECT course_num FROM course
+                       WHERE MATCH(course_name) AGAINST (%s IN NATURAL LANGUAGE MODE)
+                       UNION
+                       SELECT course_num FROM course WHERE course_num LIKE %s
+                   ) C) AS total
+            """
+            total = execute_query(count_query, (q, prefix, q, prefix), fetch_one=True)['total']
+
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            flash(f'Error running search. Details: {e}', 'error')
+            results = []
+
+    pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    return render_template(
+        'querying/search.html',
+        q=q,
+        results=results,
+        total=total,
+        page=page,
+        pages=pages
+    )
+
+
+@querying_bp.route('/coverage')
+def query_coverage():
+    """
+    Degree x objective coverage across all degrees:
+      - which objectives each degree's core courses cover
+      - gaps where an objective is only tied to non-core courses
+    """
+    try:
+        matrix = get_coverage_matrix()
+    except DatabaseUnavailable:
+        raise
+    except Exception as e:
+        flash(f'Error building the coverage matrix. Details: {e}', 'error')
+        matrix = None
+
+    return render_template('querying/coverage.html', matrix=matrix)
+
+
+@querying_bp.route('/coverage.csv')
+def query_coverage_csv():
+    """Same matrix as a CSV: one row per objective, one column per degree."""
+    matrix = get_coverage_matrix()
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(
+            ['obj_code', 'title'] + [f"{name} ({level})" for name, level in matrix.degrees]
+        )
+        for (obj_code, title), cells in matrix.rows():
+            #core courses, or "gap: <courses>" when only non-core courses cover it
+            writer.writerow([obj_code, title] + [
+                ' '.join(cell['core']) if state == 'covered'
+                else 'gap: ' + ' '.join(cell['other']) if state == 'gap'
+                else ''
+                for state, cell in cells
+            ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    return Response(
+        generate(),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=coverage_matrix.csv'}
+    )
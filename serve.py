@@ -0,0 +1,87 @@
+"""
+Production entry point: runs create_app() under gunicorn with several
+pre-forked workers.
+
+    python serve.py [--bind 0.0.0.0:8000] [--workers 4] [--threads 4]
+
+Defaults come from the optional [server] section of config.txt. The app
+is built inside each worker after the fork (no preload), so connection
+pools, job threads and caches are never shared between processes (job
+status and results are, through the [jobs] SQLite file).
+Each worker warms up before it accepts traffic.
+"""
+import argparse
+import os
+from configparser import ConfigParser
+from app import create_app
+from database.handler import warm_pool, execute_query
+from services.templates import compile_templates
+
+#small lookup tables read by nearly every page
+REFERENCE_TABLES = ['degree', 'course', 'instructor', 'learning_objective']
+
+
+def read_server_config():
+    config = ConfigParser()
+    config.read(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.txt'))
+    return dict(config.items('server')) if config.has_section('server') else {}
+
+
+def warm_up(app):
+    """Compile (or load from the bytecode cache) every template, open the pool and touch the reference tables."""
+    #templates first: they don't need the database, so a db outage doesn't leave them cold
+    templates, _ = compile_templates(app)
+    with app.app_context():
+        opened = warm_pool()
+        for table in REFERENCE_TABLES:
+            execute_query(f"SELECT COUNT(*) AS n FROM {table}", fetch_one=True)
+    print(f"[worker {os.getpid()}] warm: {opened} db connection(s), {len(templates)} template(s)")
+
+
+def post_worker_init(worker):
+    #runs in the worker after the app is loaded, before it accepts requests
+    try:
+        warm_up(worker.wsgi)
+    except Exception as e:
+        #a cold worker still works, it just pays the setup cost on its first requests
+        print(f"[worker {os.getpid()}] warm-up failed: {e}")
+
+
+def main():
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("serve.py needs gunicorn: pip install gunicorn")
+
+    defaults = read_server_config()
+    parser = argparse.ArgumentParser(description='Run the app under gunicorn.')
+    parser.add_argument('--bind', default=defaults.get('bind', '127.0.0.1:8000'))
+    parser.add_argument('--workers', type=int, default=int(defaults.get('workers', 4)))
+    parser.add_argument('--threads', type=int, default=int(defaults.get('threads', 4)))
+    parser.add_argument('--timeout', type=int, default=int(defaults.get('timeout', 60)))
+    args = parser.parse_args()
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', args.bind)
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('worker_class', 'gthread' if args.threads > 1 else 'sync')
+            self.cfg.set('timeout', args.timeout)
+            self.cfg.set('preload_app', False)
+            self.cfg.set('post_worker_init', post_worker_init)
+
+        def load(self):
+            app = create_app()
+            #one pooled connection per request thread, plus the report job threads
+            db_config = app.config['DB_CONFIG']
+            if not db_config.get('pool_size'):
+                job_workers = int(app.config.get('JOBS', {}).get('workers', 4))
+                db_config['pool_size'] = str(min(args.threads + job_workers, 32))
+            return app
+
+    Server().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Data-integrity audit for problems the schema allows but the app shouldn't
+produce:
+
+    eval_unlinked        evaluation rows whose objective isn't linked (associated) to the course for that degree
+    section_untaught     sections without a teaches row
+    eval_total_mismatch  evaluations whose A+B+C+F differs from the section's num_students
+    eval_bad_counts      evaluations with a missing or negative grade count
+
+Each check is one anti-join / filter query over every audited term at once
+(live and archive tables), windowed so it returns per-term counts plus the
+first few keys. Results are stored per term in audit_result
+(migrations/007_audit.sql).
+
+Runs are incremental: only terms touched in change_log since the last run
+are audited again, and a changed associated row re-audits every term that
+evaluates that course. The first run, or a full one, audits every term.
+"""
+import json
+import time
+from database.handler import run_in_transaction, execute_query, bump_tables, end_read_snapshot
+from database.archive import archived_through
+from services.changes import settled_change_id, decode_json
+
+TERM_TABLES = ('section', 'teaches', 'objective_eval')
+
+#name -> label, alias whose sec_year/sec_term the term filter uses, and the query;
+#{s} is '' for the live tables or '_archive', {terms} the optional term filter
+CHECKS = {
+    'eval_unlinked': {
+        'label': 'Evaluations for an objective not linked to the course for that degree',
+        'alias': 'E',
+        'sql': """
+            SELECT E.sec_year, E.sec_term, E.course_num, E.sec_num,
+                   E.degree_name, E.degree_level, E.obj_code
+            FROM objective_eval{s} E
+            LEFT JOIN associated A
+              ON A.degree_name = E.degree_name AND A.degree_level = E.degree_level
+             AND A.course_num = E.course_num AND A.obj_code = E.obj_code
+            WHERE A.obj_code IS NULL{terms}
+        """
+    },
+    'section_untaught': {
+        'label': 'Sections nobody teaches',
+        'alias': 'S',
+        'sql': """
+            SELECT S.sec_year, S.sec_term, S.course_num, S.sec_num, S.num_students
+            FROM section{s} S
+            WHERE NOT EXISTS (
+                SELECT 1 FROM teaches{s} T
+                WHERE T.course_num = S.course_num AND T.sec_num = S.sec_num
+                  AND T.sec_term = S.sec_term AND T.sec_year = S.sec_year
+            ){terms}
+        """
+    },
+    'eval_total_mismatch': {
+        'label': "Evaluations whose grade counts don't add up to the class size",
+        'alias': 'E',
+        'sql': """
+            SELECT E.sec_year, E.sec_term, E.course_num, E.sec_num,
+                   E.degree_name, E.degree_level, E.obj_code,
+                   E.perform_a + E.perform_b + E.perform_c + E.perform_f AS entered,
+                   S.num_students
+            FROM objective_eval{s} E
+            JOIN section{s} S
+              ON S.course_num = E.course_num AND S.sec_num = E.sec_num
+             AND S.sec_term = E.sec_term AND S.sec_year = E.sec_year
+            WHERE S.num_students IS NOT NULL
+              AND E.perform_a + E.perform_b + E.perform_c + E.perform_f <> S.num_students{terms}
+        """
+    },
+    'eval_bad_counts': {
+        'label': 'Evaluations with a missing or negative grade count',
+        'alias': 'E',
+        #LEAST() is NULL if any count is NULL, so IS NOT TRUE catches both
+        'sql': """
+            SELECT E.sec_year, E.sec_term, E.course_num, E.sec_num,
+                   E.degree_name, E.degree_level, E.obj_code,
+                   E.perform_a, E.perform_b, E.perform_c, E.perform_f
+            FROM objective_eval{s} E
+            WHERE (LEAST(E.perform_a, E.perform_b, E.perform_c, E.perform_f) >= 0) IS NOT TRUE{terms}
+        """
+    }
+}
+
+#per-term count and the first `sample` keys of one check, in a single pass
+WINDOWED_SQL = """
+    SELECT * FROM (
+        SELECT K.*,
+               ROW_NUMBER() OVER (PARTITION BY K.sec_year, K.sec_term
+                                  ORDER BY K.course_num, K.sec_num) AS sample_no,
+               COUNT(*) OVER (PARTITION BY K.sec_year, K.sec_term) AS anomalies
+        FROM ({check}) K
+    ) W
+    WHERE W.sample_no <= %s
+"""
+
+
+def _term_filter(alias, terms, params):
+    """'(alias.sec_year, alias.sec_term) IN (...)' for a term list, appending to params."""
+    for sec_year, sec_term in terms:
+        params.extend((sec_year, sec_term))
+    return f"({alias}.sec_year, {alias}.sec_term) IN ({', '.join(['(%s, %s)'] * len(terms))})"
+
+
+def _all_terms(cursor, suffixes):
+    terms = set()
+    for s in suffixes:
+        cursor.execute(f"SELECT DISTINCT sec_year, sec_term FROM section{s}")
+        terms.update((int(year), term) for year, term in cursor.fetchall())
+    return terms
+
+
+def _touched_terms(cursor, since, suffixes):
+    """Terms with a section/teaches/objective_eval change after since, or evaluations of a course whose links changed."""
+    tables = ', '.join(f"'{table}'" for table in TERM_TABLES)
+    #old key and new row, so an update that moves a row re-audits both terms
+    cursor.execute(
+        f"""
+        SELECT row_key->>'$.sec_year', row_key->>'$.sec_term'
+        FROM change_log
+        WHERE change_id > %s AND table_name IN ({tables})
+        UNION
+        SELECT row_data->>'$.sec_year', row_data->>'$.sec_term'
+        FROM change_log
+        WHERE change_id > %s AND table_name IN ({tables}) AND row_data IS NOT NULL
+        """,
+        (since, since)
+    )
+    terms = {(int(year), term) for year, term in cursor.fetchall() if year and term}
+
+    cursor.execute(
+        """
+        SELECT DISTINCT row_key->>'$.course_num'
+        FROM change_log
+        WHERE change_id > %s AND table_name = 'associated'
+        """,
+        (since,)
+    )
+    courses = [row[0] for row in cursor.fetchall()]
+    if courses:
+        for s in suffixes:
+            cursor.execute(
+                f"SELECT DISTINCT sec_year, sec_term FROM objective_eval{s} "
+                f"WHERE course_num IN ({', '.join(['%s'] * len(courses))})",
+                courses
+            )
+            terms.update((int(year), term) for year, term in cursor.fetchall())
+    return terms
+
+
+def _run_checks(cursor, terms, suffixes, sample):
+    """{(year, term): {check: {'anomalies': n, 'samples': [key dicts]}}} for the terms with anomalies."""
+    found = {}
+    for name, check in CHECKS.items():
+        for s in suffixes:
+            params = []
+            term_filter = "" if terms is None else " AND " + _term_filter(check['alias'], terms, params)
+            sql = check['sql'].format(s=s, terms=term_filter)
+            cursor.execute(WINDOWED_SQL.format(check=sql), params + [sample])
+            columns = cursor.column_names
+            for row in cursor.fetchall():
+                values = dict(zip(columns, row))
+                key = (int(values.pop('sec_year')), values.pop('sec_term'))
+                anomalies = values.pop('anomalies')
+                first = values.pop('sample_no') == 1
+                result = found.setdefault(key, {}).setdefault(name, {'anomalies': 0, 'samples': []})
+                #every sampled row carries the term's count; take it once per table
+                if first:
+                    result['anomalies'] += anomalies
+                if len(result['samples']) < sample:
+                    result['samples'].append(values)
+    return found
+
+
+def run_audit(full=False, terms=None, sample=5):
+    """
+    Audit and store results. terms ([(year, term)]) audits just those;
+    otherwise the terms changed since the last run (every term on the
+    first run or with full). Returns {'terms': audited terms, 'anomalies':
+    total found in them, 'seconds': elapsed}.
+    """
+    started = time.perf_counter()
+    through = archived_through()
+    #the audit's reads need a snapshot newer than the change horizon (see settled_change_id)
+    end_read_snapshot()
+
+    def audit(cursor):
+        #one audit at a time; the row lock also keeps the cursor update consistent
+        cursor.execute("SELECT last_change_id FROM audit_state WHERE id = 1 FOR UPDATE")
+        row = cursor.fetchone()
+        since = row[0] if row else None
+        settled = settled_change_id(cursor, since or 0)
+
+        all_suffixes = ('', '_archive') if through is not None else ('',)
+        existing = _all_terms(cursor, all_suffixes)
+        if terms is not None:
+            scope = {(int(year), term) for year, term in terms}
+        elif full or since is None:
+            scope = None
+        else:
+            scope = _touched_terms(cursor, since, all_suffixes)
+        audited = existing if scope is None else scope & existing
+
+        found = {}
+        if audited:
+            filter_terms = None if scope is None else sorted(audited)
+            suffixes = all_suffixes
+            if filter_terms is not None and through is not None and min(y for y, _ in filter_terms) > through:
+                suffixes = ('',)
+            found = _run_checks(cursor, filter_terms, suffixes, sample)
+
+        #drop old results for every term in scope, including ones whose sections are gone
+        if scope is None:
+            cursor.execute("DELETE FROM audit_result")
+        elif scope:
+            params = []
+            cursor.execute("DELETE FROM audit_result WHERE " + _term_filter('audit_result', sorted(scope), params), params)
+        #zero rows too, so a clean term shows as audited
+        rows = []
+        for year, term in sorted(audited):
+            results = found.get((year, term), {})
+            for name in CHECKS:
+                result = results.get(name, {'anomalies': 0, 'samples': []})
+                rows.append((year, term, name, result['anomalies'], json.dumps(result['samples'], default=str)))
+        if rows:
+            cursor.executemany(
+                "INSERT INTO audit_result (sec_year, sec_term, check_name, anomalies, samples) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                rows
+            )
+        #an audit of hand-picked terms doesn't cover the rest, so the cursor stays put
+        if terms is None:
+            cursor.execute(
+                "UPDATE audit_state SET last_change_id = %s, audited_at = NOW() WHERE id = 1",
+                (max(settled or 0, since or 0),)
+            )
+        return audited, sum(r['anomalies'] for checks in found.values() for r in checks.values())
+
+    audited, anomalies = run_in_transaction(audit)
+    bump_tables('audit_result', 'audit_state')
+    return {
+        'terms': sorted(audited),
+        'anomalies': anomalies,
+        'seconds': round(time.perf_counter() - started, 2)
+    }
+
+
+def audit_report():
+    """
+    Stored results for the page and CLI: {'audited_at', 'terms' (count of
+    audited terms), 'checks': [{'name', 'label', 'anomalies', 'terms':
+    [{'sec_year', 'sec_term', 'anomalies', 'samples'}]}]}, newest term first.
+    """
+    state = execute_query("SELECT audited_at FROM audit_state WHERE id = 1", fetch_one=True)
+    counted = execute_query(
+        "SELECT COUNT(DISTINCT sec_year, sec_term) AS n FROM audit_result", fetch_one=True
+    )
+    rows = execute_query(
+        """
+        SELECT check_name, sec_year, sec_term, anomalies, samples
+        FROM audit_result
+        WHERE anomalies > 0
+        ORDER BY sec_year DESC, FIELD(sec_term, 'Fall', 'Summer', 'Spring')
+        """
+    )
+    checks = {
+        name: {'name': name, 'label': check['label'], 'anomalies': 0, 'terms': []}
+        for name, check in CHECKS.items()
+    }
+    for row in rows:
+        check = checks.get(row['check_name'])
+        if check is None:
+            continue
+        check['anomalies'] += row['anomalies']
+        check['terms'].append({
+            'sec_year': row['sec_year'],
+            'sec_term': row['sec_term'],
+            'anomalies': row['anomalies'],
+            'samples': decode_json(row['samples']) or []
+        })
+    return {
+        'audited_at': state['audited_at'] if state else None,
+        'terms': counted['n'] if counted else 0,
+        'checks': list(checks.values())
+    }
@@ -0,0 +1,152 @@
+"""
+Reader for the change_log feed (filled by the triggers in
+migrations/006_change_log.sql).
+
+Consumers keep the last cursor they were given and ask for changes after
+it. change_id is an AUTO_INCREMENT, so ids are handed out in insert order
+but can commit out of order: a gap just before a recent row may belong to a
+transaction that is still open. Reading stops at such a gap unless the row
+after it was logged (changed_at is the row's own write time, see the
+migration) before the oldest transaction still open on the server started
+(information_schema.innodb_trx); then no open transaction can own the gap
+and it is a rolled-back id. So a cursor never skips a change that commits
+late, however long its transaction runs. Without the PROCESS privilege
+needed to read innodb_trx, a gap is skipped once it is
+[changes] settle_seconds old instead.
+"""
+import json
+from datetime import timedelta
+from flask import current_app
+from database.handler import connector, end_read_snapshot, get_db_connection_for_request, iter_query
+
+TABLES = (
+    'degree', 'course', 'instructor', 'learning_objective', 'requires',
+    'section', 'teaches', 'associated', 'objective_eval'
+)
+
+
+_horizon_warned = False
+
+
+def settle_seconds():
+    return float(current_app.config.get('CHANGES', {}).get('settle_seconds', 5))
+
+
+def change_horizon(cursor):
+    """
+    Time before which every change_log id is settled: the start of the
+    oldest transaction open on another connection, or now if there is none.
+    A gap followed by a row logged before it can't be an open transaction's.
+    Call it before the reads it guards start their snapshot.
+    """
+    global _horizon_warned
+    try:
+        cursor.execute(
+            "SELECT MIN(trx_started), NOW(6) FROM information_schema.innodb_trx "
+            "WHERE trx_mysql_thread_id <> CONNECTION_ID()"
+        )
+        oldest, now = cursor.fetchone()
+        #innodb_trx is a cached copy refreshed every 0.1s, hence the second's margin
+        return min(oldest or now, now - timedelta(seconds=1))
+    except connector().Error as err:
+        if not _horizon_warned:
+            print(f"Can't read open transactions, settling change_log gaps by age instead: {err}")
+            _horizon_warned = True
+        cursor.execute(
+            "SELECT NOW(6) - INTERVAL %s MICROSECOND", (int(settle_seconds() * 1000000),)
+        )
+        return cursor.fetchone()[0]
+
+
+def decode_json(value):
+    """A JSON column value as Python objects (the connector may return str or bytes)."""
+    if value is None or isinstance(value, (dict, list)):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    return json.loads(value)
+
+
+def settled_change_id(cursor, since):
+    """
+    How far a cursor at since can safely move: up to the first gap in
+    change_id after since that a transaction open at the change horizon may
+    still fill, or the newest id if there is none (None if nothing follows
+    since). Call it before the reads it guards start their snapshot; they
+    should run in the same transaction.
+    """
+    horizon = change_horizon(cursor)
+    #only rows logged after the horizon can follow an unsettled gap (change_log_changed_at)
+    cursor.execute(
+        """
+        SELECT MIN(R.change_id) FROM change_log R
+        WHERE R.changed_at >= %s AND R.change_id > %s + 1
+          AND NOT EXISTS (SELECT 1 FROM change_log P WHERE P.change_id = R.change_id - 1)
+        """,
+        (horizon, since)
+    )
+    unsettled = cursor.fetchone()[0]
+    if unsettled is None:
+        cursor.execute("SELECT MAX(change_id) FROM change_log WHERE change_id > %s", (since,))
+    else:
+        cursor.execute(
+            "SELECT MAX(change_id) FROM change_log WHERE change_id > %s AND change_id < %s",
+            (since, unsettled)
+        )
+    return cursor.fetchone()[0]
+
+
+def read_changes(since=0, limit=1000, tables=None):
+    """
+    Up to limit changes with change_id > since, oldest first.
+    Returns {'changes': [...], 'next': cursor to pass as since next time,
+    'more': True if another call would return more right away}.
+    tables filters the result; the cursor still moves past other tables' rows.
+    """
+    #the horizon must predate the snapshot the rows are read from
+    end_read_snapshot()
+    cursor = get_db_connection_for_request().cursor()
+    try:
+        through = settled_change_id(cursor, since)
+    finally:
+        cursor.close()
+    if through is None:
+        return {'changes': [], 'next': since, 'more': False}
+
+    #log rows are never cached: the triggers don't bump any cache generation
+    rows = iter_query(
+        """
+        SELECT change_id, changed_at, table_name, op, row_key, row_data, source
+        FROM change_log
+        WHERE change_id > %s AND change_id <= %s
+        ORDER BY change_id
+        LIMIT %s
+        """,
+        (since, through, limit)
+    )
+
+    changes = []
+    cursor = since
+    examined = 0
+    for row in rows:
+        examined += 1
+        cursor = row.change_id
+        if tables and row.table_name not in tables:
+            continue
+        changes.append({
+            'id': row.change_id,
+            'at': row.changed_at.isoformat(),
+            'table': row.table_name,
+            'op': row.op,
+            'key': decode_json(row.row_key),
+            'row': decode_json(row.row_data),
+            'source': row.source
+        })
+    #drops the unread rest of the batch so the connection can be reused
+    rows.close()
+
+    return {
+        'changes': changes,
+        'next': cursor,
+        'more': examined == limit and cursor < through
+    }
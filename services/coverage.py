@@ -0,0 +1,107 @@
+"""
+Degree x objective coverage matrix built from requires + associated.
+
+All links are read in one join and folded into a sparse dict keyed by
+(objective index, degree index). The result is cached per process and
+rebuilt only when one of the source tables has been written to.
+"""
+import threading
+from database.handler import execute_query, table_generation, end_read_snapshot
+
+SOURCE_TABLES = ('degree', 'learning_objective', 'requires', 'associated')
+
+_cache = {'generation': None, 'matrix': None}
+_cache_lock = threading.Lock()
+
+
+class CoverageMatrix:
+    """
+    degrees: [(degree_name, degree_level)], objectives: [(obj_code, title)],
+    cells: {(obj_index, degree_index): {'core': [course], 'other': [course]}}.
+    """
+
+    def __init__(self, degrees, objectives, cells):
+        self.degrees = degrees
+        self.objectives = objectives
+        self.cells = cells
+
+    def cell(self, obj_index, degree_index):
+        return self.cells.get((obj_index, degree_index))
+
+    @staticmethod
+    def state(cell):
+        #covered: a core course teaches it; gap: only non-core courses do
+        if cell is None:
+            return 'none'
+        return 'covered' if cell['core'] else 'gap'
+
+    def rows(self):
+        """Yield (objective, [(state, cell)] per degree) in display order."""
+        for oi, objective in enumerate(self.objectives):
+            yield objective, [
+                (self.state(self.cells.get((oi, di))), self.cells.get((oi, di)))
+                for di in range(len(self.degrees))
+            ]
+
+    def degree_summary(self):
+        """Per degree: how many linked objectives are covered by core courses vs. gaps."""
+        summary = [{'covered': 0, 'gap': 0} for _ in self.degrees]
+        for (_, di), cell in self.cells.items():
+            summary[di][self.state(cell)] += 1
+        return summary
+
+
+def build_coverage_matrix():
+    degrees = [
+        (r.degree_name, r.degree_level)
+        for r in execute_query(
+            "SELECT degree_name, degree_level FROM degree ORDER BY degree_name, degree_level",
+            row_mode='tuple'
+        )
+    ]
+    objectives = [
+        (r.obj_code, r.title)
+        for r in execute_query(
+            "SELECT obj_code, title FROM learning_objective ORDER BY obj_code",
+            row_mode='tuple'
+        )
+    ]
+    degree_index = {d: i for i, d in enumerate(degrees)}
+    obj_index = {o[0]: i for i, o in enumerate(objectives)}
+
+    #every objective-course link with the course's core flag for that degree
+    links = execute_query("""
+        SELECT A.degree_name, A.degree_level, A.obj_code, A.course_num, R.core
+        FROM associated A
+        JOIN requires R
+          ON A.degree_name = R.degree_name
+         AND A.degree_level = R.degree_level
+         AND A.course_num = R.course_num
+        ORDER BY A.course_num
+    """, row_mode='tuple')
+
+    cells = {}
+    for link in links:
+        key = (obj_index[link.obj_code], degree_index[(link.degree_name, link.degree_level)])
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = {'core': [], 'other': []}
+        cell['core' if link.core else 'other'].append(link.course_num)
+
+    return CoverageMatrix(degrees, objectives, cells)
+
+
+def get_coverage_matrix():
+    """Cached matrix; rebuilt after any write to the source tables (by any worker)."""
+    #generations first, then a fresh snapshot: a build that reads older data
+    #than the generation it is stored under would never be replaced
+    generation = table_generation(*SOURCE_TABLES)
+    end_read_snapshot()
+    with _cache_lock:
+        if _cache['generation'] == generation:
+            return _cache['matrix']
+    matrix = build_coverage_matrix()
+    with _cache_lock:
+        _cache['generation'] = generation
+        _cache['matrix'] = matrix
+    return matrix
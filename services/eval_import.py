@@ -0,0 +1,222 @@
+"""
+Bulk import of evaluation results from a CSV export of the department
+spreadsheets. Expected columns (header row, any order, case-insensitive):
+
+    course, section, term, year, degree, objective, based_on, a, b, c, f, improvements
+
+degree is written the way the forms send it: "Degree Name|Level".
+
+Rows are streamed into a temporary staging table, checked in one
+set-based UPDATE against section and associated (the same rules as
+save_evaluation), and the valid ones are upserted chunk by chunk.
+"""
+import csv
+from database.handler import get_db_connection_for_request, run_in_transaction, bump_tables
+from database.dashboard import refresh_sections
+
+COLUMNS = ('course', 'section', 'term', 'year', 'degree', 'objective',
+           'based_on', 'a', 'b', 'c', 'f', 'improvements')
+REQUIRED = ('course', 'section', 'term', 'year', 'degree', 'objective', 'a', 'b', 'c', 'f')
+TERMS = ('Spring', 'Summer', 'Fall')
+#column widths from database_schema.sql, so one long cell can't fail a whole batch
+MAX_LENGTHS = (('course', 8), ('section', 3), ('objective', 8), ('based_on', 30))
+#likewise the ranges of YEAR and INT, which strict mode rejects for the whole batch
+YEAR_RANGE = (1901, 2155)
+MAX_COUNT = 2147483647
+
+STAGE_SQL = """
+    CREATE TEMPORARY TABLE eval_import_stage (
+        line INT PRIMARY KEY,
+        course_num VARCHAR(8),
+        sec_num VARCHAR(3),
+        sec_term VARCHAR(6),
+        sec_year YEAR,
+        degree_name VARCHAR(30),
+        degree_level VARCHAR(5),
+        obj_code VARCHAR(8),
+        based_on VARCHAR(30),
+        perform_a INT,
+        perform_b INT,
+        perform_c INT,
+        perform_f INT,
+        improvements TEXT,
+        error VARCHAR(255)
+    )
+"""
+
+STAGE_INSERT = """
+    INSERT INTO eval_import_stage
+      (line, course_num, sec_num, sec_term, sec_year, degree_name, degree_level,
+       obj_code, based_on, perform_a, perform_b, perform_c, perform_f, improvements)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+#every rule in one pass; first failing rule wins
+VALIDATE_SQL = """
+    UPDATE eval_import_stage St
+    LEFT JOIN section S
+      ON S.course_num = St.course_num AND S.sec_num = St.sec_num
+     AND S.sec_term = St.sec_term AND S.sec_year = St.sec_year
+    LEFT JOIN associated A
+      ON A.course_num = St.course_num AND A.obj_code = St.obj_code
+     AND A.degree_name = St.degree_name AND A.degree_level = St.degree_level
+    SET St.error = CASE
+        WHEN S.sec_num IS NULL
+            THEN 'Section not found (or its year is archived).'
+        WHEN A.obj_code IS NULL
+            THEN 'Objective is not linked to this course for that degree.'
+        WHEN S.num_students IS NOT NULL
+         AND St.perform_a + St.perform_b + St.perform_c + St.perform_f != S.num_students
+            THEN CONCAT('You entered ', St.perform_a + St.perform_b + St.perform_c + St.perform_f,
+                        ' grades, but the class limit is ', S.num_students, '.')
+    END
+"""
+
+#existing rows are overwritten and their version bumped, so open forms see a conflict
+UPSERT_SQL = """
+    INSERT INTO objective_eval
+      (based_on, perform_a, perform_b, perform_c, perform_f, improvements,
+       sec_num, sec_term, sec_year,
+       obj_code, degree_name, degree_level, course_num)
+    SELECT St.based_on, St.perform_a, St.perform_b, St.perform_c, St.perform_f, St.improvements,
+           St.sec_num, St.sec_term, St.sec_year,
+           St.obj_code, St.degree_name, St.degree_level, St.course_num
+    FROM eval_import_stage St
+    WHERE St.error IS NULL AND St.line BETWEEN %s AND %s
+    ORDER BY St.sec_num, St.sec_term, St.sec_year, St.obj_code,
+             St.degree_name, St.degree_level, St.course_num
+    ON DUPLICATE KEY UPDATE
+        based_on = St.based_on,
+        perform_a = St.perform_a,
+        perform_b = St.perform_b,
+        perform_c = St.perform_c,
+        perform_f = St.perform_f,
+        improvements = St.improvements,
+        version = objective_eval.version + 1
+"""
+
+
+def _parse_row(row):
+    """Turn one CSV row into stage values, or raise ValueError with a readable message."""
+    missing = [name for name in REQUIRED if not (row.get(name) or '').strip()]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}.")
+
+    for name, limit in MAX_LENGTHS:
+        if len((row.get(name) or '').strip()) > limit:
+            raise ValueError(f"{name} is longer than {limit} characters.")
+
+    term = row['term'].strip().capitalize()
+    if term not in TERMS:
+        raise ValueError(f"Term must be one of {', '.join(TERMS)}.")
+    try:
+        year = int(row['year'])
+    except ValueError:
+        raise ValueError("Year must be a whole number.")
+    if not YEAR_RANGE[0] <= year <= YEAR_RANGE[1]:
+        raise ValueError(f"Year must be between {YEAR_RANGE[0]} and {YEAR_RANGE[1]}.")
+    if '|' not in row['degree']:
+        raise ValueError('Degree must look like "Degree Name|Level".')
+    degree_name, degree_level = (part.strip() for part in row['degree'].split('|', 1))
+    if len(degree_name) > 30 or len(degree_level) > 5:
+        raise ValueError("Degree name or level is too long.")
+
+    counts = []
+    for name in ('a', 'b', 'c', 'f'):
+        try:
+            value = int(row[name])
+        except ValueError:
+            raise ValueError(f"{name.upper()} must be a whole number.")
+        if value < 0:
+            raise ValueError(f"{name.upper()} can't be negative.")
+        if value > MAX_COUNT:
+            raise ValueError(f"{name.upper()} is too large.")
+        counts.append(value)
+
+    return (
+        row['course'].strip(), row['section'].strip(), term, year,
+        degree_name, degree_level, row['objective'].strip(),
+        (row.get('based_on') or '').strip() or None,
+        *counts,
+        (row.get('improvements') or '').strip() or None
+    )
+
+
+def import_evaluations(lines, chunk_size=500, dry_run=False):
+    """
+    Import evaluation rows from an iterable of CSV text lines.
+    Returns {'rows', 'valid', 'imported', 'errors': [(line, message), ...]};
+    with dry_run nothing is written to objective_eval.
+    """
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is None:
+        return {'rows': 0, 'valid': 0, 'imported': 0, 'errors': [(1, 'The file is empty.')]}
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = [name for name in REQUIRED if name not in reader.fieldnames]
+    if missing:
+        return {'rows': 0, 'valid': 0, 'imported': 0, 'errors': [(1, f"Missing column(s): {', '.join(missing)}.")]}
+
+    conn = get_db_connection_for_request()
+    cursor = conn.cursor()
+    errors = []
+    seen = {}
+    rows = 0
+    last_line = 1
+    try:
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS eval_import_stage")
+        cursor.execute(STAGE_SQL)
+
+        #stream the file into the stage table, chunk_size rows per round trip
+        batch = []
+        for row in reader:
+            line = reader.line_num
+            last_line = line
+            rows += 1
+            try:
+                values = _parse_row(row)
+            except ValueError as e:
+                errors.append((line, str(e)))
+                continue
+            key = values[:7]
+            if key in seen:
+                errors.append((line, f"Same section/degree/objective as line {seen[key]}."))
+                continue
+            seen[key] = line
+            batch.append((line,) + values)
+            if len(batch) >= chunk_size:
+                cursor.executemany(STAGE_INSERT, batch)
+                batch = []
+        if batch:
+            cursor.executemany(STAGE_INSERT, batch)
+
+        cursor.execute(VALIDATE_SQL)
+        cursor.execute("SELECT line, error FROM eval_import_stage WHERE error IS NOT NULL")
+        errors.extend(cursor.fetchall())
+        conn.commit()
+    finally:
+        cursor.close()
+
+    errors.sort()
+    valid = rows - len(errors)
+    if dry_run or valid == 0:
+        return {'rows': rows, 'valid': valid, 'imported': 0, 'errors': errors}
+
+    def upsert(start, end):
+        def work(cursor):
+            cursor.execute(UPSERT_SQL, (start, end))
+            cursor.execute(
+                """
+                SELECT DISTINCT course_num, sec_num, sec_term, sec_year
+                FROM eval_import_stage
+                WHERE error IS NULL AND line BETWEEN %s AND %s
+                """,
+                (start, end)
+            )
+            refresh_sections(cursor, [tuple(key) for key in cursor.fetchall()])
+        return work
+
+    #short transactions, so a big import doesn't hold locks on half the table
+    for start in range(2, last_line + 1, chunk_size):
+        run_in_transaction(upsert(start, start + chunk_size - 1))
+    bump_tables('objective_eval', 'instructor_dashboard')
+    return {'rows': rows, 'valid': valid, 'imported': valid, 'errors': errors}
@@ -0,0 +1,182 @@
+"""
+Background report jobs.
+
+Jobs run on a thread pool in the worker that accepted them, but their
+status and results live in a small SQLite file ([jobs] path, default
+jobs.sqlite3), so any worker can answer the poll that follows the redirect.
+Results are stored as JSON.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+
+class Job:
+    """One background report run and its stored result."""
+
+    def __init__(self, key, name, params, job_id=None, status='queued', result=None,
+                 error=None, created=None, finished=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.key = key
+        self.name = name
+        self.params = params
+        self.status = status
+        self.result = result
+        self.error = error
+        self.created = created or time.time()
+        self.finished = finished
+
+    @classmethod
+    def from_row(cls, row):
+        job_id, key, name, params, status, result, error, created, finished = row
+        return cls(
+            key, name, json.loads(params), job_id=job_id, status=status,
+            result=json.loads(result) if result is not None else None,
+            error=error, created=created, finished=finished
+        )
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'error': self.error,
+            'created': self.created,
+            'finished': self.finished
+        }
+
+
+class JobRunner:
+    """
+    Job runner for heavy reports, shared by every worker through one SQLite file.
+    Identical requests (same report name + params) share one queued, running
+    or finished job until its TTL runs out, so a report only runs once.
+    """
+
+    COLUMNS = 'id, key, name, params, status, result, error, created, finished'
+
+    def __init__(self, path, max_workers=4, ttl=600):
+        self.path = path
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self._reset()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, key TEXT, name TEXT, params TEXT, status TEXT,"
+                " result TEXT, error TEXT, created REAL, finished REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key)")
+        #a forked worker must not reuse the parent's threads or sqlite handles
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='report-job'
+                )
+            return self._executor
+
+    def _purge(self, conn, now):
+        #finished jobs older than the ttl, and ones whose worker died before finishing
+        conn.execute(
+            "DELETE FROM jobs WHERE (finished IS NOT NULL AND finished < ?) OR created < ?",
+            (now - self.ttl, now - 2 * self.ttl)
+        )
+
+    def submit(self, app, name, func, params):
+        """Start func(**params) in the background, or reuse a matching job."""
+        key = name + ':' + json.dumps(params, sort_keys=True, default=str)
+        conn = self._conn()
+        #IMMEDIATE: two workers submitting the same report can't both start it
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._purge(conn, time.time())
+            row = conn.execute(
+                f"SELECT {self.COLUMNS} FROM jobs WHERE key = ? AND status != 'failed' "
+                "ORDER BY created DESC LIMIT 1",
+                (key,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                return Job.from_row(row)
+
+            job = Job(key, name, params)
+            conn.execute(
+                f"INSERT INTO jobs ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, NULL)",
+                (job.id, key, name, json.dumps(params, default=str), job.status, job.created)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._get_executor().submit(self._run, app, job, func)
+        return job
+
+    def _update(self, job_id, **fields):
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        self._conn().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _run(self, app, job, func):
+        self._update(job.id, status='running')
+        try:
+            #app context gives the job its own db connection, closed on exit
+            with app.app_context():
+                result = func(**job.params)
+            self._update(job.id, status='done', result=json.dumps(result, default=str), finished=time.time())
+        except Exception as e:
+            self._update(job.id, status='failed', error=str(e), finished=time.time())
+
+    def get(self, job_id):
+        conn = self._conn()
+        self._purge(conn, time.time())
+        row = conn.execute(f"SELECT {self.COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+
+def init_jobs(app):
+    """Create the app's job runner from the optional [jobs] config section."""
+    config = app.config.get('JOBS', {})
+    path = config.get('path', 'jobs.sqlite3')
+    if not os.path.isabs(path):
+        path = os.path.join(app.root_path, path)
+    app.extensions['jobs'] = JobRunner(
+        path,
+        max_workers=int(config.get('workers', 4)),
+        ttl=int(config.get('ttl_seconds', 600))
+    )
+
+
+def get_job_runner():
+    return current_app.extensions['jobs']
+
+
+def submit_job(name, func, **params):
+    """Queue a report for the current app and return its Job."""
+    app = current_app._get_current_object()
+    return get_job_runner().submit(app, name, func, params)
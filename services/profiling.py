@@ -0,0 +1,250 @@
+import collections
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from werkzeug.wsgi import ClosingIterator
+
+#requests never profiled (static files and the profile viewer itself)
+SKIP_PREFIXES = ('/static/', '/admin/profiles')
+
+#frames from these files count as SQL / template time
+SQL_MARKERS = (os.sep + 'mysql' + os.sep, os.sep + 'aiomysql' + os.sep, os.sep + 'pymysql' + os.sep)
+TEMPLATE_MARKERS = (os.sep + 'jinja2' + os.sep,)
+CATEGORIES = ('sql', 'template', 'python')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _category(filename):
+    if any(marker in filename for marker in SQL_MARKERS):
+        return 'sql'
+    #compiled templates report the .html file as their filename
+    if filename.endswith('.html') or any(marker in filename for marker in TEMPLATE_MARKERS):
+        return 'template'
+    return None
+
+
+def _label(code):
+    filename = code.co_filename
+    if filename.startswith(ROOT + os.sep):
+        filename = filename[len(ROOT) + 1:]
+    else:
+        filename = os.sep.join(filename.split(os.sep)[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _sample(frame):
+    """(category, root-to-leaf stack) for one thread's current frame."""
+    stack = []
+    category = None
+    while frame is not None:
+        code = frame.f_code
+        stack.append(_label(code))
+        #sql wins over template: a streamed template pulling rows is waiting on mysql
+        if category != 'sql':
+            category = _category(code.co_filename) or category
+        frame = frame.f_back
+    stack.reverse()
+    return category or 'python', tuple(stack)
+
+
+class Sampler:
+    """
+    One background thread per process that snapshots the stacks of the
+    threads being profiled every interval. The profiled code runs untouched
+    (no tracing hooks), so the cost is the sampler's own wake-ups.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def start(self, ident):
+        counts = collections.Counter()
+        with self._lock:
+            self._active[ident] = counts
+            #a forked worker doesn't inherit the parent's thread
+            if self._thread is None or self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+        self._wake.set()
+        return counts
+
+    def stop(self, ident):
+        with self._lock:
+            self._active.pop(ident, None)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                active = list(self._active.items())
+                if not active:
+                    self._wake.clear()
+            if not active:
+                #sleep until a request is profiled again
+                self._wake.wait()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for ident, counts in active:
+                frame = frames.get(ident)
+                if frame is not None and ident != me:
+                    counts[_sample(frame)] += 1
+
+
+class ProfileStore:
+    """Per-request profiles on disk: <id>.json summary plus <id>.folded stacks for flamegraph tools."""
+
+    def __init__(self, directory, keep=200):
+        self.directory = directory
+        self.keep = keep
+
+    def write(self, record, counts):
+        os.makedirs(self.directory, exist_ok=True)
+        #millisecond prefix keeps file names in time order for prune()
+        profile_id = f"{int(record['started'] * 1000)}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        record['id'] = profile_id
+
+        split = collections.Counter()
+        leaves = collections.Counter()
+        for (category, stack), n in counts.items():
+            split[category] += n
+            if stack:
+                leaves[(category, stack[-1])] += n
+        total = sum(split.values())
+        #samples only give proportions; scale them by the measured wall time
+        record['samples'] = total
+        record['split_ms'] = {
+            category: round(record['duration_ms'] * split[category] / total, 1) if total else 0
+            for category in CATEGORIES
+        }
+        record['hot'] = [
+            {'function': function, 'category': category, 'samples': n}
+            for (category, function), n in leaves.most_common(15)
+        ]
+
+        with open(os.path.join(self.directory, profile_id + '.folded'), 'w') as f:
+            for (category, stack), n in counts.most_common():
+                f.write(';'.join((category,) + stack) + f" {n}\n")
+        tmp = os.path.join(self.directory, profile_id + '.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp, os.path.join(self.directory, profile_id + '.json'))
+        self.prune()
+        return profile_id
+
+    def _summaries(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if name.endswith('.json'))
+
+    def prune(self):
+        names = self._summaries()
+        for name in names[:max(len(names) - self.keep, 0)]:
+            for suffix in ('.json', '.folded'):
+                try:
+                    os.remove(os.path.join(self.directory, name[:-5] + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def slowest(self, limit=50):
+        """Summaries of the kept profiles, slowest first."""
+        records = []
+        for name in self._summaries():
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    records.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        records.sort(key=lambda r: r['duration_ms'], reverse=True)
+        return records[:limit]
+
+    def folded_path(self, profile_id):
+        path = os.path.join(self.directory, os.path.basename(profile_id) + '.folded')
+        return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """
+    WSGI wrapper that profiles a random sample_rate fraction of requests,
+    and (when slow_ms is set) any request that turns out slower than that.
+    Profiling lasts until the response body is fully sent, so streamed
+    templates are included.
+    """
+
+    def __init__(self, wsgi_app, store, sample_rate=0.0, slow_ms=0, interval=0.005):
+        self.wsgi_app = wsgi_app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.sampler = Sampler(interval)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        sampled = random.random() < self.sample_rate
+        if path.startswith(SKIP_PREFIXES) or not (sampled or self.slow_ms):
+            return self.wsgi_app(environ, start_response)
+
+        ident = threading.get_ident()
+        record = {
+            'method': environ.get('REQUEST_METHOD'),
+            'path': path,
+            'query': environ.get('QUERY_STRING', ''),
+            'status': None,
+            'started': time.time(),
+            'sampled': sampled
+        }
+        started = time.perf_counter()
+        counts = self.sampler.start(ident)
+
+        def profiled_start_response(status, headers, exc_info=None):
+            record['status'] = status.split(' ', 1)[0]
+            return start_response(status, headers, exc_info)
+
+        def finish():
+            self.sampler.stop(ident)
+            record['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            if sampled or record['duration_ms'] >= self.slow_ms:
+                try:
+                    self.store.write(record, counts)
+                except OSError as e:
+                    print(f"Profiler could not write profile: {e}")
+
+        try:
+            result = self.wsgi_app(environ, profiled_start_response)
+        except Exception:
+            finish()
+            raise
+        return ClosingIterator(result, finish)
+
+
+def init_profiling(app):
+    """Wrap the app in the profiler when the optional [profiling] section enables it."""
+    config = app.config.get('PROFILING', {})
+    directory = config.get('directory', 'profiles')
+    if not os.path.isabs(directory):
+        directory = os.path.join(app.root_path, directory)
+    store = ProfileStore(directory, keep=int(config.get('keep', 200)))
+    app.extensions['profiling'] = store
+
+    if config.get('enabled', 'false').lower() not in ('1', 'true', 'yes', 'on'):
+        return
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app,
+        store,
+        sample_rate=float(config.get('sample_rate', 0)),
+        slow_ms=float(config.get('slow_ms', 0)),
+        interval=float(config.get('interval_ms', 5)) / 1000
+    )
@@ -0,0 +1,232 @@
+"""
+Columnar snapshot of the evaluation facts (objective_eval joined to section)
+for offline analytics.
+
+One file per term (<year>_<term>.evsnap) so a term can be refreshed on its
+own. Layout of a file:
+
+    b'EVSNAP01' | uint32 header length | JSON header | padding | int32 columns
+
+The header holds the row count, the dictionaries for the key columns
+(degree, obj_code, course_num, sec_num) and each column's byte offset.
+Key columns store dictionary codes; measure columns store the counts.
+Readers mmap the file and aggregate straight from the column buffers.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from database.handler import execute_query, iter_query
+from database.archive import year_source
+
+MAGIC = b'EVSNAP01'
+SUFFIX = '.evsnap'
+KEY_COLUMNS = ('degree', 'obj_code', 'course_num', 'sec_num')
+MEASURE_COLUMNS = ('perform_a', 'perform_b', 'perform_c', 'perform_f', 'num_students')
+GROUP_KEYS = KEY_COLUMNS + ('term',)
+
+#{evals}/{sections} are the live tables, or live + archive for archived years
+FACTS_SQL = """
+    SELECT OE.degree_name, OE.degree_level, OE.obj_code, OE.course_num, OE.sec_num,
+           OE.perform_a, OE.perform_b, OE.perform_c, OE.perform_f, S.num_students
+    FROM {evals} OE
+    JOIN {sections} S
+      ON OE.course_num = S.course_num
+     AND OE.sec_num = S.sec_num
+     AND OE.sec_term = S.sec_term
+     AND OE.sec_year = S.sec_year
+    WHERE OE.sec_term = %s
+      AND OE.sec_year = %s
+"""
+
+
+def partition_name(sec_term, sec_year):
+    return f"{int(sec_year)}_{sec_term}{SUFFIX}"
+
+
+def write_partition(path, sec_term, sec_year, rows):
+    """Encode (degree, obj, course, sec, a, b, c, f, students) rows into one file."""
+    dictionaries = {name: {} for name in KEY_COLUMNS}
+    columns = {name: array('i') for name in KEY_COLUMNS + MEASURE_COLUMNS}
+
+    for row in rows:
+        keys = (f"{row.degree_name}|{row.degree_level}", row.obj_code, row.course_num, row.sec_num)
+        for name, value in zip(KEY_COLUMNS, keys):
+            codes = dictionaries[name]
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(codes)
+            columns[name].append(code)
+        measures = (row.perform_a, row.perform_b, row.perform_c, row.perform_f, row.num_students)
+        for name, value in zip(MEASURE_COLUMNS, measures):
+            columns[name].append(value or 0)
+
+    count = len(columns['degree'])
+    offset = 0
+    layout = []
+    for name, values in columns.items():
+        layout.append({'name': name, 'offset': offset})
+        offset += len(values) * values.itemsize
+
+    header = {
+        'term': sec_term,
+        'year': int(sec_year),
+        'rows': count,
+        'byteorder': sys.byteorder,
+        #dict keeps insertion order, so list position == code
+        'dictionaries': {name: list(codes) for name, codes in dictionaries.items()},
+        'columns': layout
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    #column data starts on an 8-byte boundary
+    data_start = len(MAGIC) + 4 + len(header_bytes)
+    padding = (-data_start) % 8
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * padding)
+        for values in columns.values():
+            values.tofile(f)
+    #readers never see a half-written partition
+    os.replace(tmp_path, path)
+    return count
+
+
+def export_snapshot(directory, terms=None):
+    """
+    Write one partition per (sec_term, sec_year). With terms=None every term
+    that has evaluations is exported; otherwise only the given terms are
+    rewritten and the other partitions are left as they are.
+    Returns {(term, year): row count}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if terms is None:
+        terms = [
+            (r['sec_term'], r['sec_year'])
+            for r in execute_query("""
+                SELECT DISTINCT sec_term, sec_year FROM objective_eval
+                UNION
+                SELECT DISTINCT sec_term, sec_year FROM objective_eval_archive
+            """)
+        ]
+
+    written = {}
+    for sec_term, sec_year in terms:
+        path = os.path.join(directory, partition_name(sec_term, sec_year))
+        sql = FACTS_SQL.format(
+            evals=year_source('objective_eval', sec_year),
+            sections=year_source('section', sec_year)
+        )
+        rows = iter_query(sql, (sec_term, sec_year))
+        written[(sec_term, int(sec_year))] = write_partition(path, sec_term, sec_year, rows)
+    return written
+
+
+class Partition:
+    """One memory-mapped term file."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an evaluation snapshot")
+
+        (header_len,) = struct.unpack_from('<I', self._map, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self._map[header_start:header_start + header_len])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+
+        self.term = header['term']
+        self.year = header['year']
+        self.rows = header['rows']
+        self.dictionaries = header['dictionaries']
+
+        data_start = header_start + header_len
+        data_start += (-data_start) % 8
+        view = memoryview(self._map)
+        self.columns = {}
+        for column in header['columns']:
+            start = data_start + column['offset']
+            self.columns[column['name']] = view[start:start + self.rows * 4].cast('i')
+
+    def close(self):
+        #column views must be released before the map can close
+        for column in self.columns.values():
+            column.release()
+        self.columns = {}
+        self._map.close()
+        self._file.close()
+
+
+class Snapshot:
+    """
+    Read-only view over every partition in a snapshot directory.
+
+        snap = Snapshot('snapshots')
+        snap.aggregate(by=('degree', 'term'))
+    """
+
+    def __init__(self, directory):
+        self.partitions = [
+            Partition(os.path.join(directory, name))
+            for name in sorted(os.listdir(directory))
+            if name.endswith(SUFFIX)
+        ]
+
+    def close(self):
+        for partition in self.partitions:
+            partition.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def aggregate(self, by=('degree',), terms=None, years=None):
+        """
+        Sum the measure columns grouped by any of degree, obj_code,
+        course_num, sec_num and term. terms/years optionally limit which
+        partitions are read. Returns {group tuple: {measure: total, 'rows': n}}.
+        """
+        for key in by:
+            if key not in GROUP_KEYS:
+                raise ValueError(f"Can't group by {key!r}; pick from {', '.join(GROUP_KEYS)}")
+
+        totals = {}
+        for part in self.partitions:
+            if terms and part.term not in terms:
+                continue
+            if years and part.year not in years:
+                continue
+
+            term_label = f"{part.term} {part.year}"
+            key_columns = [part.columns[k] for k in by if k != 'term']
+            key_names = [part.dictionaries[k] for k in by if k != 'term']
+            measures = [part.columns[m] for m in MEASURE_COLUMNS]
+
+            #group on raw codes first, decode each group once at the end
+            groups = {}
+            for i in range(part.rows):
+                codes = tuple(col[i] for col in key_columns)
+                sums = groups.get(codes)
+                if sums is None:
+                    sums = groups[codes] = [0] * (len(MEASURE_COLUMNS) + 1)
+                for j, col in enumerate(measures):
+                    sums[j] += col[i]
+                sums[-1] += 1
+
+            for codes, sums in groups.items():
+                decoded = iter(names[code] for names, code in zip(key_names, codes))
+                group = tuple(term_label if k == 'term' else next(decoded) for k in by)
+                total = totals.setdefault(group, dict.fromkeys(MEASURE_COLUMNS + ('rows',), 0))
+                for name, value in zip(MEASURE_COLUMNS + ('rows',), sums):
+                    total[name] += value
+
+        return totals
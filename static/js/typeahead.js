@@ -0,0 +1,64 @@
+// Turns <input data-typeahead="/api/..."> into a type-to-search field.
+// Options are fetched as the user types and the picked value is copied
+// into the hidden input named by data-target.
+(function () {
+    document.querySelectorAll('input[data-typeahead]').forEach(function (input) {
+        const list = document.getElementById(input.getAttribute('list'));
+        const target = document.getElementById(input.dataset.target);
+        const source = input.dataset.typeahead;
+        const labels = {};
+        let lastQuery = null;
+        let timer = null;
+
+        // Keep a value that was filled in by the server (e.g. after a failed POST)
+        if (input.value && target.value) {
+            labels[input.value] = target.value;
+        }
+
+        // Copy the matching value into the hidden input, or flag the field as invalid
+        function sync() {
+            const value = labels[input.value];
+            if (value !== undefined) {
+                target.value = value;
+                input.setCustomValidity('');
+            } else {
+                target.value = '';
+                input.setCustomValidity(input.value ? 'Pick one of the suggestions from the list.' : '');
+            }
+            target.dispatchEvent(new Event('change'));
+        }
+
+        function load(query) {
+            if (query === lastQuery) {
+                return;
+            }
+            lastQuery = query;
+            const url = source + (source.indexOf('?') === -1 ? '?' : '&') + 'q=' + encodeURIComponent(query);
+            fetch(url)
+                .then(function (response) { return response.json(); })
+                .then(function (options) {
+                    // Ignore answers for something the user already typed past
+                    if (query !== lastQuery) {
+                        return;
+                    }
+                    list.innerHTML = '';
+                    options.forEach(function (option) {
+                        labels[option.label] = option.value;
+                        const el = document.createElement('option');
+                        el.value = option.label;
+                        list.appendChild(el);
+                    });
+                    sync();
+                });
+        }
+
+        input.addEventListener('focus', function () {
+            load(input.value.trim());
+        });
+        input.addEventListener('input', function () {
+            sync();
+            clearTimeout(timer);
+            timer = setTimeout(function () { load(input.value.trim()); }, 150);
+        });
+    });
+})();